@@ -0,0 +1,431 @@
+"""
+Micro-benchmarks of the hot paths, compared with the baselines stored in benchmarks/baselines.json
+
+    python benchmarks/bench.py              # fails if a case is slower than threshold x its baseline
+    python benchmarks/bench.py --update     # records the current timings as baselines
+    python benchmarks/bench.py -k clauses   # only the cases whose name contains "clauses"
+    python benchmarks/bench.py --memory     # peak memory of the compact dtypes against int64 arrays
+    python benchmarks/bench.py --timings    # appends real solve timings to benchmarks/timings.jsonl
+
+gophersat is replaced by benchmarks/stub/gophersat so that the suite runs offline.
+The import_* cases time a fresh interpreter importing a module, see its detail with
+    python -X importtime -c "import models"
+"""
+import os
+import sys
+import json
+import gc
+import time
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from generator import GradesGenerator
+import models
+from utils.helpers import powerset, get_i2v
+
+
+BASELINES = os.path.join(ROOT, 'benchmarks', 'baselines.json')
+STUB = os.path.join(ROOT, 'benchmarks', 'stub') + os.sep
+
+SIZES = (100, 1000)
+CRITERIA = (3, 5)
+
+# name -> function(size, nb_grades) returning the callable to time
+CASES = {}
+
+
+def case(name, sizes=SIZES, criteria=CRITERIA):
+    def register(function):
+        CASES[name] = (function, sizes, criteria)
+        return function
+    return register
+
+
+def instance(size, nb_grades, nb_class=1):
+    gen = GradesGenerator(size=size, nb_grades=nb_grades, nb_class=nb_class, noise=0, seed=1)
+    grades, admissions = gen.generate_grades()
+    return gen, grades, admissions
+
+
+def fitted(solver_class, size, nb_grades, nb_class=1):
+    gen, grades, admissions = instance(size, nb_grades, nb_class)
+    solver = solver_class(gen)
+    solver.init_clauses(grades, admissions)
+    # All-false model, as answered by the stub
+    d = {v: False for v in solver.i2v.values()}
+    return solver, grades, admissions, d
+
+
+@case('generate_grades', sizes=(1000, 10000))
+def bench_generate_grades(size, nb_grades):
+    gen, _, _ = instance(size, nb_grades)
+    return gen.generate_grades
+
+
+@case('classifier', sizes=(1000, 10000))
+def bench_classifier(size, nb_grades):
+    gen, grades, _ = instance(size, nb_grades)
+    return lambda: gen.classifier(grades)
+
+
+@case('init_clauses_sat')
+def bench_init_clauses_sat(size, nb_grades):
+    gen, grades, admissions = instance(size, nb_grades)
+    solver = models.SAT_Solver(gen)
+    return lambda: solver.init_clauses(grades, admissions)
+
+
+@case('init_clauses_maxsat')
+def bench_init_clauses_maxsat(size, nb_grades):
+    gen, grades, admissions = instance(size, nb_grades)
+    solver = models.Max_SAT_Solver(gen)
+    return lambda: solver.init_clauses(grades, admissions)
+
+
+@case('clauses_to_dimacs')
+def bench_clauses_to_dimacs(size, nb_grades):
+    solver, _, _, _ = fitted(models.SAT_Solver, size, nb_grades)
+    return lambda: models.clauses_to_dimacs(solver.clause, len(solver.i2v))
+
+
+@case('clauses_to_wcnf')
+def bench_clauses_to_wcnf(size, nb_grades):
+    solver, _, _, _ = fitted(models.Max_SAT_Solver, size, nb_grades)
+    return lambda: models.clauses_to_wcnf(solver.clause, solver.clause_weights, len(solver.i2v))
+
+
+@case('get_i2v', sizes=(0,))
+def bench_get_i2v(size, nb_grades):
+    v2i_alpha = {(i, k): i*models.MAX_GRADE+k+1 for i in range(nb_grades) for k in range(models.MAX_GRADE)}
+    A = len(v2i_alpha)
+    v2i_beta = {frozenset(v): A+i+1 for i, v in enumerate(powerset(range(nb_grades)))}
+    return lambda: get_i2v(v2i_alpha, v2i_beta, A)
+
+
+@case('solve_sat_stub', sizes=(100,))
+def bench_solve_sat(size, nb_grades):
+    solver, _, _, _ = fitted(models.SAT_Solver, size, nb_grades)
+    return lambda: solver.solve(path=STUB)
+
+
+@case('solve_maxsat_stub', sizes=(100,))
+def bench_solve_maxsat(size, nb_grades):
+    solver, _, _, _ = fitted(models.Max_SAT_Solver, size, nb_grades)
+    return lambda: solver.solve(path=STUB)
+
+
+@case('predict_sat')
+def bench_predict_sat(size, nb_grades):
+    solver, grades, admissions, d = fitted(models.SAT_Solver, size, nb_grades)
+    solver.solution = d, 0
+    return lambda: solver.get_results(grades, admissions, verbose=0)
+
+
+@case('predict_sat_multiclass')
+def bench_predict_sat_multiclass(size, nb_grades):
+    solver, grades, _, d = fitted(models.SAT_Solver, size, nb_grades, nb_class=2)
+    return lambda: [solver.predict(student, d) for student in grades]
+
+
+@case('predict_tables')
+def bench_predict_tables(size, nb_grades):
+    solver, grades, _, d = fitted(models.SAT_Solver, size, nb_grades)
+    alpha, beta = models.sat_tables(d, nb_grades, 1)
+    return lambda: models.predict_tables(alpha, beta, grades)
+
+
+@case('milp_build', sizes=(100, 200))
+def bench_milp_build(size, nb_grades):
+    import milp
+    gen, grades, admissions = instance(size, nb_grades)
+
+    def build():
+        solver = milp.MRSort_Solver(gen, grades=grades, admission=admissions)
+        solver.set_constraint('MaxMin')
+        solver.model.update()
+    return build
+
+
+@case('enumerative_solve', sizes=(1000, 10000), criteria=(2, 3))
+def bench_enumerative_solve(size, nb_grades):
+    from enumerative import Enumerative_Solver
+    gen, grades, admissions = instance(size, nb_grades)
+    solver = Enumerative_Solver(gen, grades=grades, admission=admissions, workers=1)
+    return solver.solve
+
+
+@case('milp_template_update', sizes=(100, 200))
+def bench_milp_template_update(size, nb_grades):
+    import milp
+    gen, grades, admissions = instance(size, nb_grades)
+    template = milp.MRSort_Template(gen, grades=grades, admission=admissions)
+    template.model.update()
+    shuffled = grades[::-1].copy()
+
+    def update():
+        template.set_data(shuffled, admissions[::-1])
+        template.model.update()
+    return update
+
+
+@case('alternating_solve', sizes=(1000, 10000))
+def bench_alternating_solve(size, nb_grades):
+    import milp
+    gen, grades, admissions = instance(size, nb_grades)
+    solver = milp.MRSort_Alternating(gen, grades=grades, admission=admissions, n_starts=2, workers=1)
+    return solver.solve
+
+
+def bench_import(module):
+    def bench(size, nb_grades):
+        command = [sys.executable, '-c', f'import {module}']
+        return lambda: subprocess.run(command, cwd=ROOT, check=True)
+    return bench
+
+
+# Startup cost of the entry points: the SAT path (models) must not import gurobipy, sklearn or pandas
+for module in ('models', 'milp', 'planner', 'ensemble', 'main'):
+    case(f'import_{module}', sizes=(0,), criteria=(0,))(bench_import(module))
+
+
+# name -> function(compact) returning the callable whose peak memory is traced, compact=False
+# upcasting grades and labels to int64 as they were stored before
+MEMORY_CASES = {}
+MEMORY_SIZE = 10**6
+
+
+def memory_case(name):
+    def register(function):
+        MEMORY_CASES[name] = function
+        return function
+    return register
+
+
+@memory_case('generate_grades')
+def memory_generate_grades(compact):
+    gen = GradesGenerator(size=MEMORY_SIZE, nb_grades=5, noise=0.05, seed=1)
+
+    def generate():
+        grades, admissions = gen.generate_grades()
+        if not compact:
+            grades, admissions = grades.astype(np.int64), admissions.astype(np.int64)
+        return grades, admissions
+    return generate
+
+
+@memory_case('predict_tables')
+def memory_predict_tables(compact):
+    gen, grades, admissions = instance(MEMORY_SIZE, 5)
+    if not compact:
+        grades, admissions = grades.astype(np.int64), admissions.astype(np.int64)
+    alpha, beta = models.mrsort_tables(gen.weights, gen.betas - 0.5, gen.lbd)
+
+    def score():
+        predicted = models.predict_tables(alpha, beta, grades)
+        if not compact:
+            predicted = predicted.astype(np.int64)
+        return (predicted == admissions).sum()
+    return score
+
+
+def measure_memory(function):
+    """
+    Peak memory allocated by a callable and the size of what it returns
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    kept = sum(array.nbytes for array in result) if isinstance(result, tuple) else 0
+    return peak, kept
+
+
+def run_memory(pattern: str = ''):
+    """
+    Print the peak memory of each memory case, with the compact dtypes and with int64 arrays
+    """
+    for name, function in MEMORY_CASES.items():
+        if pattern not in name:
+            continue
+        (compact, compact_kept), (wide, wide_kept) = [measure_memory(function(flag)) for flag in (True, False)]
+        print(f'{name:30s} peak {compact/2**20:8.1f} MiB (int64 {wide/2**20:8.1f} MiB, x{wide/compact:5.2f})'
+              + (f'  data {compact_kept/2**20:6.1f} MiB (int64 {wide_kept/2**20:6.1f} MiB)' if compact_kept else ''))
+
+
+# (backend, lazy) -> sizes and criteria of the solve timings that calibrate the planner, the MILP
+# sizes stay within the size-limited Gurobi license
+TIMING_GRID = {
+    ('SAT', False): ((100, 300, 1000, 3000, 10000, 30000), (2, 3, 4, 5, 6, 7)),
+    ('SAT', True): ((1000, 3000, 10000, 30000), (2, 3, 4, 5, 6)),
+    ('Max-SAT', False): ((100, 300, 1000, 3000, 10000), (2, 3, 4, 5, 6)),
+    ('MILP', False): ((25, 50, 100), (2, 3)),
+    ('MILP', True): ((300, 1000, 3000, 10000), (2, 3)),
+}
+TIMING_LIMIT = 120
+
+
+def record_timings(pattern: str = '', path: str = ROOT, solver: str = 'gophersat', seeds=(0, 1)):
+    """
+    Time real solves (encoding and solver, noise-free datasets) through the service and append one
+    record per solve to the timings of the planner, the solves that reach TIMING_LIMIT are censored and skipped
+    Args:
+        path (str) : directory of the SAT solver called by the SAT backends
+        solver (str) : name of that solver, stored in the source of the records
+    """
+    import service
+    from planner import TIMINGS
+    service.init_worker(path)
+    solvers = {'SAT': solver, 'Max-SAT': solver}
+    if service.worker['env'] is not None:
+        import gurobipy
+        solvers['MILP'] = 'gurobipy {}.{}.{}'.format(*gurobipy.gurobi.version())
+    with open(TIMINGS, 'a') as file:
+        for (backend, lazy), (sizes, criteria) in TIMING_GRID.items():
+            if pattern not in backend:
+                continue
+            for size in sizes:
+                for nb_grades in criteria:
+                    for seed in seeds:
+                        gen = GradesGenerator(size=size, nb_grades=nb_grades, noise=0, seed=seed)
+                        grades, admissions = gen.generate_grades()
+                        request = {'model': backend, 'lazy': lazy, 'grades': grades, 'admissions': admissions,
+                                   'time_limit': TIMING_LIMIT}
+                        start = time.perf_counter()
+                        try:
+                            result = service.fit(request)
+                        except Exception as error:  # e.g. the MILP above the license size
+                            print(f'{backend:8s} lazy={lazy!s:5s} {size:6d} x {nb_grades}  skipped ({error})')
+                            continue
+                        elapsed = time.perf_counter() - start
+                        if elapsed >= TIMING_LIMIT or result['errors']:
+                            print(f'{backend:8s} lazy={lazy!s:5s} {size:6d} x {nb_grades}  censored')
+                            continue
+                        record = {'backend': backend, 'lazy': lazy, 'size': size, 'nb_grades': nb_grades, 'nb_class': 1,
+                                  'profiles': len(np.unique(grades, axis=0)), 'time': round(elapsed, 4),
+                                  'accuracy': result['accuracy'], 'found': bool(result['params']),
+                                  'encoding': 'coalition' if backend == 'Max-SAT' else None,
+                                  'source': f'bench.py --timings ({solvers[backend]})'}
+                        file.write(json.dumps(record) + '\n')
+                        file.flush()
+                        print(f'{backend:8s} lazy={lazy!s:5s} {size:6d} x {nb_grades}  {elapsed:8.3f} s')
+
+
+def measure(function, min_time: float = 0.5, min_runs: int = 5):
+    """
+    Best time of a callable over at least min_runs runs and min_time seconds,
+    with the garbage collector disabled as in timeit
+    """
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        while len(timings) < min_runs or time.perf_counter() - start < min_time:
+            t0 = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - t0)
+    finally:
+        gc.enable()
+    return min(timings)
+
+
+def run(pattern: str = '', baselines: dict = {}, threshold: float = None, retries: int = 2):
+    """
+    Time every case, re-measuring up to retries times the cases above threshold x their baseline
+    so that a noisy run is not reported as a regression
+    Returns :
+        results (dict<str, float>) : best time in seconds of each case and size
+    """
+    results = {}
+    for name, (function, sizes, criteria) in CASES.items():
+        if pattern not in name:
+            continue
+        for size in sizes:
+            for nb_grades in criteria:
+                key = f'{name}[size={size},nb_grades={nb_grades}]'
+                try:
+                    timed = function(size, nb_grades)
+                except ImportError as error:  # e.g. no gurobipy for milp_build
+                    print(f'{key:60s} skipped ({error})')
+                    continue
+                results[key] = measure(timed)
+                for _ in range(retries):
+                    if threshold is None or key not in baselines or results[key] <= threshold*baselines[key]:
+                        break
+                    results[key] = min(results[key], measure(timed))
+    return results
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--update",
+                        action='store_true',
+                        help='Record the timings as the new baselines')
+    parser.add_argument("-t",
+                        "--threshold",
+                        default=2.0,
+                        type=float,
+                        help='Maximum ratio to the baseline before failing (default: %(default)s)')
+    parser.add_argument("--memory",
+                        action='store_true',
+                        help='Report the peak memory of the memory cases instead of timing')
+    parser.add_argument("--timings",
+                        action='store_true',
+                        help='Append real solve timings to benchmarks/timings.jsonl (planner calibration)')
+    parser.add_argument("--gophersat",
+                        default=ROOT,
+                        help='Directory of the gophersat solver used by --timings (default: the repository)')
+    parser.add_argument("--solver",
+                        default='gophersat',
+                        help='Name of the SAT solver found there, recorded in the timings (default: %(default)s)')
+    parser.add_argument("-k",
+                        default='',
+                        help='Only run the cases whose name contains this string')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    os.chdir(tempfile.mkdtemp(prefix='mrsort_bench_'))  # SAT working files
+    if args.memory:
+        run_memory(args.k)
+        sys.exit(0)
+    if args.timings:
+        record_timings(args.k, args.gophersat, args.solver)
+        sys.exit(0)
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as file:
+            baselines = json.load(file)
+    results = run(args.k, baselines, None if args.update else args.threshold)
+
+    regressions = []
+    for key, timing in results.items():
+        if key in baselines:
+            ratio = timing / baselines[key]
+            status = 'REGRESSION' if ratio > args.threshold else 'ok'
+            if ratio > args.threshold:
+                regressions.append(key)
+            print(f'{key:60s} {timing*1e3:10.3f} ms  baseline {baselines[key]*1e3:10.3f} ms  x{ratio:5.2f}  {status}')
+        else:
+            print(f'{key:60s} {timing*1e3:10.3f} ms  (no baseline)')
+
+    if args.update:
+        # A full run replaces the baselines, a filtered one only updates its cases
+        baselines = results if args.k == '' else {**baselines, **results}
+        with open(BASELINES, 'w') as file:
+            json.dump(dict(sorted(baselines.items())), file, indent=1)
+        print(f'Baselines written to {BASELINES}')
+    elif regressions:
+        print(f'{len(regressions)} regression(s) above x{args.threshold}')
+        sys.exit(1)
@@ -0,0 +1,93 @@
+import os
+import weakref
+import tempfile
+import numpy as np
+
+from models import MAX_GRADE, predict_tables
+
+
+class CompiledModel:
+    def __init__(self, alpha, beta, full_grid: bool = False, max_bytes: int = 2**30, mmap_bytes: int = 2**26,
+                 directory: str = None, chunk_size: int = 2**20):
+        """
+        Precompute the decision function of a model (tables of models.sat_tables or models.mrsort_tables)
+        over the whole grade domain, so that scoring a student is one lookup in a uint8 table
+        A memory-mapped table is removed by close, at the end of a with block, or when the model is
+        garbage collected
+        Args:
+            full_grid (bool) : tabulate the MAX_GRADE^n grid, instead of only the grades that the
+                frontiers of the model distinguish on each criterion
+            max_bytes (int) : memory budget of the table, above it predict falls back to direct evaluation
+            mmap_bytes (int) : size above which the table is memory-mapped to a file
+            directory (str) : directory of the memory-mapped table, a temporary one by default
+            chunk_size (int) : number of cells evaluated at once while compiling
+        """
+        self.alpha = np.asarray(alpha)
+        self.beta = np.asarray(beta)
+        self.nb_grades = self.alpha.shape[1]
+        self.filename = None
+        self.finalizer = None
+
+        # codes[i, k] : index of grade k among the grades distinguished on criterion i
+        # grade_of[i][c] : a grade of each code, used to evaluate the cells
+        codes, grade_of = [], []
+        for i in range(self.nb_grades):
+            if full_grid:
+                code, grade = np.arange(MAX_GRADE), np.arange(MAX_GRADE)
+            else:
+                _, grade, code = np.unique(self.alpha[:, i, :].T, axis=0, return_index=True, return_inverse=True)
+                code = code.reshape(-1)
+            codes.append(code)
+            grade_of.append(grade)
+        self.shape = tuple(len(grade) for grade in grade_of)
+        self.cells = int(np.prod(self.shape, dtype=object))
+
+        if self.cells > max_bytes:
+            print(f"Compiled table of {self.cells} bytes exceeds the budget of {max_bytes} bytes, using direct evaluation")
+            self.table = None
+            return
+        strides = np.cumprod((1,) + self.shape[:0:-1])[::-1]
+        # Flat index of a student = sum of the offsets of its grades
+        self.offsets = np.array(codes) * strides[:, None]
+
+        if self.cells > mmap_bytes:
+            fd, self.filename = tempfile.mkstemp(suffix='.uint8', dir=directory)
+            os.close(fd)
+            self.finalizer = weakref.finalize(self, os.remove, self.filename)
+            self.table = np.memmap(self.filename, dtype=np.uint8, mode='w+', shape=(self.cells,))
+        else:
+            self.table = np.empty(self.cells, dtype=np.uint8)
+
+        for start in range(0, self.cells, chunk_size):
+            cells = np.arange(start, min(start + chunk_size, self.cells))
+            digits = np.unravel_index(cells, self.shape)
+            grades = np.stack([grade_of[i][digits[i]] for i in range(self.nb_grades)], axis=1)
+            self.table[start:start + len(cells)] = predict_tables(self.alpha, self.beta, grades)
+        if self.filename is not None:
+            self.table.flush()
+
+    def predict(self, grades):
+        """
+        Classify students with one gather in the compiled table
+        Returns :
+            predicted (array<int>) : class of each student
+        """
+        grades = np.asarray(grades)
+        if self.table is None:
+            return predict_tables(self.alpha, self.beta, grades)
+        return self.table[self.offsets[np.arange(self.nb_grades), grades].sum(axis=1)]
+
+    def close(self):
+        """
+        Release the memory-mapped table
+        """
+        if self.filename is not None:
+            self.table = None
+            self.finalizer()
+            self.filename = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,149 @@
+import time
+import numpy as np
+
+from scheduler import Scheduler
+from models import MAX_GRADE, monotone_closure, mrsort_tables, predict_tables
+from utils.helpers import LABEL_DTYPE
+from utils.metrics import f1_score, accuracy_score
+
+
+# Backends of the members, run by the workers of service.py
+BACKENDS = ('MILP', 'SAT', 'Max-SAT')
+
+
+class MRSort_Ensemble:
+    def __init__(self, generator, backend: str = 'MILP', n_estimators: int = 25, sample_size: int = 100,
+                 time_limit: float = 10, min_accuracy: float = 0.8, workers: int = None, threads: int = 1,
+                 memory: int = None, path: str = './'):
+        """
+        Bagged ensemble of MR-Sort models, each learned on a bootstrap subsample of the students
+        Args:
+            backend (str) : MILP, SAT or Max-SAT
+            n_estimators (int) : number of members
+            sample_size (int) : number of students of each subsample
+            time_limit (float) : time limit in seconds of each member
+            min_accuracy (float) : members below this accuracy on their own subsample are dropped
+            workers (int) : number of cores, all the available ones by default
+            threads (int) : cores of each member (Threads of Gurobi)
+            memory (int) : bytes that the members learned concurrently may use together, unlimited by default
+            path (str) : path to the gophersat solver
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"The ensemble backend should be one of {', '.join(BACKENDS)}, not {backend}")
+        self.gen = generator
+        self.backend = backend
+        self.n_estimators = n_estimators
+        self.sample_size = sample_size
+        self.time_limit = time_limit
+        self.min_accuracy = min_accuracy
+        self.workers = workers
+        self.threads = threads
+        self.memory = memory
+        self.path = path
+        if backend == 'MILP' and generator.noise > 0:
+            print("WARNING: the MILP is infeasible or degenerate on noisy labels (no model classifies every "
+                  "student), its members are mostly dropped, use the Max-SAT backend")
+
+        self.members = []  # (alpha, beta) tables of each member
+        self.params = []  # learned parameters of each member
+        self.consensus = None  # (alpha, beta) tables of the consensus model
+        self.time = None
+
+    def fit(self, grades, admissions):
+        """
+        Learn the members in parallel, then aggregate them into a consensus model
+        """
+        grades = np.asarray(grades)
+        admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
+        rng = np.random.default_rng(self.gen.seed)
+        requests = []
+        for _ in range(self.n_estimators):
+            sample = rng.choice(len(grades), size=self.sample_size, replace=True)
+            requests.append({'kind': 'fit', 'model': self.backend, 'grades': grades[sample],
+                             'admissions': admissions[sample], 'nb_class': self.gen.nb_class,
+                             'time_limit': self.time_limit, 'template': True})
+
+        start = time.time()
+        scheduler = Scheduler(cores=self.workers, threads=self.threads, memory=self.memory, path=self.path)
+        results = scheduler.map(requests)
+        # Members that failed, found no model in time or don't fit their own subsample are dropped
+        learned = [result for result in results if result.get('params')]
+        self.params = [result['params'] for result in learned if result['accuracy'] >= self.min_accuracy]
+        self.time = time.time() - start
+
+        self.members = [self.tables(params) for params in self.params]
+        if len(self.members) > 0:
+            self.consensus = self.aggregate()
+        print(f"Ensemble: {len(self.members)}/{self.n_estimators} members learned in {self.time:.2f} seconds"
+              + (f", {len(learned) - len(self.members)} dropped below {self.min_accuracy*100:.0f} % accuracy"
+                 if len(learned) > len(self.members) else ''))
+
+    def tables(self, params):
+        """
+        Lookup tables of the parameters of a member
+        """
+        if 'weights' in params:
+            return mrsort_tables(params['weights'], params['betas'], params['lambda'])
+        return np.array(params['alpha']), np.array(params['beta'])
+
+    def aggregate(self):
+        """
+        Consensus model: median frontiers of the members and majority vote on the coalitions,
+        or mean weights, median betas and median lambda with the MILP backend
+        Returns :
+            alpha, beta (array<bool>, array<bool>) : tables of the consensus model
+        """
+        if self.backend == 'MILP':
+            weights = np.mean([params['weights'] for params in self.params], axis=0)
+            self.weights = weights / weights.sum()
+            self.betas = np.median([params['betas'] for params in self.params], axis=0)
+            self.lbd = np.median([params['lambda'] for params in self.params])
+            return mrsort_tables(self.weights, self.betas, self.lbd)
+
+        alphas = np.array([alpha for alpha, _ in self.members])
+        # First sufficient grade of each member, on each criterion and at each level
+        frontiers = np.where(alphas.any(axis=-1), alphas.argmax(axis=-1), MAX_GRADE)
+        self.betas = np.median(frontiers, axis=0).round().astype(int)
+        alpha = np.arange(MAX_GRADE) >= self.betas[..., None]
+        beta = monotone_closure(np.mean([beta for _, beta in self.members], axis=0) > 0.5)
+        return alpha, beta
+
+    def predict(self, grades, consensus: bool = False):
+        """
+        Classify students by majority vote of the members, or with the consensus model
+        Returns :
+            predicted (array<int>) : class of each student
+        """
+        if consensus:
+            return predict_tables(*self.consensus, grades)
+        votes = np.array([predict_tables(alpha, beta, grades) for alpha, beta in self.members])
+        counts = (votes[..., None] == np.arange(self.gen.nb_class+1)).sum(axis=0)
+        return counts.argmax(axis=1)
+
+    def get_results(self, grades, admissions, consensus: bool = False, verbose: int = 1):
+        """
+        Print results of the ensemble
+        Returns :
+            f1_score_ (float): f1-score of the solution
+            accuracy_ (float): accuracy of the solution
+            time (float): time spent learning the members
+            error_rate (int): numer of misclassification
+        """
+        if len(self.members) == 0:
+            print("WARNING: no member of the ensemble found a solution")
+            return 0, 0, 0, len(admissions)
+        admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
+        predicted = self.predict(grades, consensus=consensus)
+        accuracy_ = accuracy_score(admissions, predicted)
+        f1_score_ = f1_score(admissions, predicted, average='macro')
+        error_rate = sum(admissions != predicted)
+        if verbose == 1:
+            if self.backend == 'MILP':
+                print(f"Lambda: {self.lbd}")
+                print(f"Weights: {self.weights}")
+            print(f"Betas: {self.betas}")
+            print("Ran in: {:.2f} seconds ".format(self.time))
+            print("Precision: {:.2f} %".format(accuracy_*100))
+            print("F1-score:  {:.2f} %".format(f1_score_*100))
+            print(f"Error rate: {error_rate} errors")
+        return f1_score_, accuracy_, self.time, error_rate
@@ -0,0 +1,182 @@
+import time
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from models import MAX_GRADE
+from utils.metrics import f1_score, accuracy_score
+
+
+# Above this number of criteria the enumeration is too large to be practical
+MAX_CRITERIA = 4
+# Number of (prefix, profile) cells of a block, bounds the memory of a worker
+BLOCK_CELLS = 2**20
+
+
+def threshold_functions(nb_grades):
+    """
+    Every weighted majority rule over the coalitions of nb_grades criteria, with integer weights
+    in 0..nb_grades (enough to represent all the threshold functions up to 4 criteria) and a
+    lambda of at least 1 so that the empty coalition is never a majority
+    Returns :
+        tables (array<bool>) : tables[f, mask] is True if coalition mask is a majority for rule f
+        rules (array<int>) : weights and lambda of each rule, the last column being lambda
+    """
+    masks = np.arange(2**nb_grades)
+    members = (masks[:, None] >> np.arange(nb_grades)) & 1
+    rules = np.array([weights + (lbd,) for weights in product(range(nb_grades+1), repeat=nb_grades)
+                      for lbd in range(1, sum(weights)+2)])
+    tables = (members @ rules[:, :-1].T >= rules[:, -1]).T
+    tables, index = np.unique(tables, axis=0, return_index=True)
+    return tables, rules[index]
+
+
+def score_block(args):
+    """
+    Best rule and frontiers among the candidates of a block: the frontiers of the first criteria
+    are fixed by each prefix of the block, the last one is swept over every grade with a cumulative sum
+    Prefixes are evaluated in decreasing order of an upper bound of their accuracy, and
+    dropped as soon as their bound can't beat the incumbent
+    Returns :
+        best (tuple) : (number of correctly classified students, prefix, last frontier, rule index)
+    """
+    prefixes, profiles, diff, negatives, tables, incumbent = args
+    nb_grades = profiles.shape[1]
+    half = 2**(nb_grades-1)
+    bins = MAX_GRADE + 1
+
+    # masks[p, u] : criteria of profile u above the frontiers of prefix p, except the last one
+    masks = ((profiles[None, :, :-1] >= prefixes[:, None, :]) << np.arange(nb_grades-1)).sum(axis=-1)
+    cells = (np.arange(len(prefixes))[:, None]*half + masks)*bins + profiles[:, -1]
+    # counts[p, m, g] : accepted minus rejected students of coalition m with grade g on the last criterion
+    counts = np.bincount(cells.ravel(), weights=np.broadcast_to(diff, cells.shape).ravel(),
+                         minlength=len(prefixes)*half*bins).reshape(len(prefixes), half, bins)
+    # Any decision function of (coalition, last grade) can't do better
+    bounds = negatives + np.clip(counts, 0, None).sum(axis=(1, 2))
+
+    best = (incumbent, None, None, None)
+    for p in np.argsort(-bounds, kind='stable'):
+        if bounds[p] <= best[0]:
+            break
+        # above[b, m] : students of coalition m with a last grade >= b, for every frontier b
+        above = np.cumsum(counts[p, :, ::-1], axis=1)[:, ::-1].T
+        below = counts[p].sum(axis=1) - above
+        coalitions = np.concatenate([below, above], axis=1)  # (frontier, 2^nb_grades)
+        scores = negatives + coalitions @ tables.T
+        frontier, rule = np.unravel_index(scores.argmax(), scores.shape)
+        if scores[frontier, rule] > best[0]:
+            best = (scores[frontier, rule], prefixes[p], frontier, rule)
+    return best
+
+
+class Enumerative_Solver:
+    def __init__(self, generator, admission=None, grades=None, workers: int = None, block_cells: int = BLOCK_CELLS):
+        """
+        Initialize the solver
+        Exact MR-Sort learner for 1 to MAX_CRITERIA criteria: only the observed grades matter
+        as frontiers, so every frontier vector and every weighted majority rule is enumerated
+        and the most accurate model is returned
+        Args:
+            workers (int) : number of worker processes, all the cores by default (1 runs in process)
+            block_cells (int) : number of (prefix, distinct student) cells of a block of candidates
+        """
+        self.gen = generator
+        if admission is None:
+            self.grades, self.admission = generator.generate_grades()
+        else:
+            self.grades, self.admission = np.array(grades), np.array(admission)
+        self.nb_grades = self.gen.nb_grades
+        if self.gen.nb_class != 1:
+            raise ValueError('Enumerative_Solver only handles 2 classes')
+        if self.nb_grades > MAX_CRITERIA:
+            raise ValueError(f'Enumerative_Solver handles at most {MAX_CRITERIA} criteria')
+        self.workers = workers
+        self.block_cells = block_cells
+
+        self.weights, self.betas, self.lbd = None, None, None
+        self.correct = None  # number of correctly classified students
+        self.candidates = None  # number of (frontiers, rule) candidates
+        self.time = None
+
+    def solve(self):
+        """
+        Enumerate the candidates by blocks in parallel, stopping at the first model classifying every student
+        """
+        start = time.time()
+        accepted = self.admission.astype(bool)
+        profiles, inverse = np.unique(self.grades, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        diff = (np.bincount(inverse, weights=accepted, minlength=len(profiles))
+                - np.bincount(inverse, weights=~accepted, minlength=len(profiles)))
+        negatives = (~accepted).sum()
+        tables, rules = threshold_functions(self.nb_grades)
+
+        # Frontiers of the first criteria: the observed grades and MAX_GRADE (criterion never passed)
+        values = [np.append(np.unique(profiles[:, i]), MAX_GRADE) for i in range(self.nb_grades-1)]
+        prefixes = list(product(*values))
+        prefixes = np.array(prefixes, dtype=int).reshape(len(prefixes), self.nb_grades-1)
+        self.candidates = len(prefixes) * (MAX_GRADE+1) * len(tables)
+        block_size = max(1, self.block_cells // len(profiles))
+        blocks = [(prefixes[i:i+block_size], profiles, diff, negatives, tables, -1)
+                  for i in range(0, len(prefixes), block_size)]
+
+        best = (-1, None, None, None)
+        if self.workers == 1 or len(blocks) == 1:
+            for block in blocks:
+                best = max(best, score_block(block[:-1] + (best[0],)), key=lambda result: result[0])
+                if best[0] == len(self.grades):
+                    break
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(score_block, block) for block in blocks]
+                for future in as_completed(futures):
+                    best = max(best, future.result(), key=lambda result: result[0])
+                    if best[0] == len(self.grades):
+                        for other in futures:
+                            other.cancel()
+                        break
+
+        self.correct, prefix, frontier, rule = best
+        self.correct = int(self.correct)
+        frontiers = np.append(prefix, frontier)
+        weights, lbd = rules[rule, :-1], rules[rule, -1]
+        # MR-Sort parameters as learned by MRSort_Solver: grade > betas and sum of weights > lambda
+        self.betas = frontiers - 0.5
+        if weights.sum() == 0:  # every student rejected
+            self.weights, self.lbd = np.full(self.nb_grades, 1/self.nb_grades), 1.
+        else:
+            self.weights, self.lbd = weights / weights.sum(), (lbd - 0.5) / weights.sum()
+        self.time = time.time() - start
+
+    def predict(self, grades):
+        """
+        Classify students with the solution
+        Returns :
+            results (array<bool>): True or False based on admission
+        """
+        return ((np.asarray(grades) > self.betas) * self.weights).sum(axis=1) > self.lbd
+
+    def get_results(self, verbose: int = 1):
+        """
+        Print results of the solver
+        Returns :
+            f1_score_ (float): f1-score of the solution
+            accuracy_ (float): accuracy of the solution
+            time (float): time spent enumerating the candidates
+            error_rate (int): numer of misclassification
+        """
+        admission = self.admission.astype(bool)
+        results = self.predict(self.grades)
+        f1_score_ = f1_score(admission, results)
+        accuracy_ = accuracy_score(admission, results)
+        error_rate = int((results != admission).sum())
+        if verbose == 1:
+            print(f"Lambda: {self.lbd}")
+            print(f"Weights: {self.weights}")
+            print(f"Betas: {self.betas}")
+            print(f"Candidates: {self.candidates}")
+            print("Ran in: {:.2f} seconds ".format(self.time))
+            print("Precision: {:.2f} %".format(accuracy_*100))
+            print("F1-score:  {:.2f} %".format(f1_score_*100))
+            print(f"Error rate: {error_rate} errors")
+        return f1_score_, accuracy_, self.time, error_rate
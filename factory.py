@@ -0,0 +1,143 @@
+import io
+import os
+import json
+import hashlib
+import zipfile
+from itertools import product, groupby
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import sys
+sys.path.append('./')
+
+from generator import GradesGenerator
+from utils.argument import parse_factory_arguments
+
+
+INDEX_FILE = 'index.json'
+# Fixed timestamp of the shard members, so that shards are bit-identical between runs
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def instance_key(instance_id, name):
+    """
+    Name of an array of an instance in its shard, e.g. 0000003/grades
+    """
+    return f'{instance_id:07d}/{name}'
+
+
+def make_instance(size, nb_grades, nb_class, noise, seed):
+    """
+    Generate one instance
+    Args:
+        seed (np.random.SeedSequence) : seed of the instance, its streams are spawned from it
+    Returns :
+        instance (dict<str, array>) : parameters, grades and admissions of the instance
+    """
+    gen = GradesGenerator(size=size, nb_grades=nb_grades, nb_class=nb_class, noise=noise, seed=seed)
+    grades, admissions = gen.generate_grades()
+    return {'grades': grades, 'admissions': admissions, 'weights': gen.weights,
+            'betas': gen.betas, 'lbd': np.array(gen.lbd), 'noise': np.array(gen.noise)}
+
+
+def write_shard(filename, arrays):
+    """
+    Write arrays in a .npz file readable with np.load, without the timestamps of np.savez
+    Returns :
+        sha256 (str) : checksum of the shard
+    """
+    with zipfile.ZipFile(filename, 'w') as shard:
+        for name in sorted(arrays):
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, np.asarray(arrays[name]), allow_pickle=False)
+            shard.writestr(zipfile.ZipInfo(name + '.npy', date_time=ZIP_DATE_TIME), buffer.getvalue())
+    with open(filename, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def build_shard(directory, shard_id, jobs):
+    """
+    Generate and write the instances of one shard
+    Returns :
+        shard (dict) : index entry of the shard
+    """
+    filename = f'shard_{shard_id:05d}.npz'
+    arrays = {}
+    for job in jobs:
+        instance = make_instance(job['size'], job['nb_grades'], job['nb_class'], job['noise'],
+                                 np.random.SeedSequence(job['entropy'], spawn_key=tuple(job['spawn_key'])))
+        for name, array in instance.items():
+            arrays[instance_key(job['id'], name)] = array
+    sha256 = write_shard(os.path.join(directory, filename), arrays)
+    return {'file': filename, 'sha256': sha256}
+
+
+def build_instances(directory, configs, repeats: int = 1, seed: int = 0, shard_size: int = 100, workers: int = None):
+    """
+    Generate benchmark instances across a process pool
+    Every instance gets its own SeedSequence spawned from seed, and shards only depend on
+    the instance ids, so the output is bit-identical whatever the number of workers
+    Args:
+        directory (str) : output directory
+        configs (list<dict>) : size, nb_grades, nb_class and noise of the instances
+        repeats (int) : number of instances per config
+        seed (int) : root seed
+        shard_size (int) : number of instances per shard
+        workers (int) : number of processes, all the cores by default
+    Returns :
+        index (dict) : content of the index file
+    """
+    os.makedirs(directory, exist_ok=True)
+    root = np.random.SeedSequence(seed)
+    jobs = []
+    for child, config in zip(root.spawn(len(configs)*repeats), [c for c in configs for _ in range(repeats)]):
+        jobs.append({'id': len(jobs), 'entropy': child.entropy, 'spawn_key': list(child.spawn_key),
+                     'size': config['size'], 'nb_grades': config['nb_grades'],
+                     'nb_class': config['nb_class'], 'noise': config['noise']})
+    shards = [jobs[i:i+shard_size] for i in range(0, len(jobs), shard_size)]
+
+    args = ([directory]*len(shards), range(len(shards)), shards)
+    if workers == 1:
+        entries = list(map(build_shard, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            entries = list(executor.map(build_shard, *args))
+
+    for shard_id, shard in enumerate(shards):
+        for job in shard:
+            job['shard'] = shard_id
+    index = {'seed': seed, 'shards': entries, 'instances': jobs}
+    with open(os.path.join(directory, INDEX_FILE), 'w') as file:
+        json.dump(index, file, indent=1)
+    return index
+
+
+def load_index(directory):
+    """
+    Read the index of a directory of instances
+    """
+    with open(os.path.join(directory, INDEX_FILE)) as file:
+        return json.load(file)
+
+
+def iter_instances(directory, index=None):
+    """
+    Iterate over the instances of a directory, loading each shard once
+    Returns :
+        (entry, instance) (dict, dict<str, array>) : index entry and arrays of each instance
+    """
+    if index is None:
+        index = load_index(directory)
+    for shard_id, entries in groupby(index['instances'], key=lambda entry: entry['shard']):
+        with np.load(os.path.join(directory, index['shards'][shard_id]['file'])) as shard:
+            for entry in entries:
+                prefix = instance_key(entry['id'], '')
+                yield entry, {name[len(prefix):]: shard[name] for name in shard.files if name.startswith(prefix)}
+
+
+if __name__ == '__main__':
+    args = parse_factory_arguments()
+    configs = [{'size': size, 'nb_grades': nb_grades, 'nb_class': nb_class, 'noise': noise}
+               for size, nb_grades, nb_class, noise in product(args.sizes, args.nb_grades, args.nb_class, args.noise)]
+    index = build_instances(args.out, configs, repeats=args.repeats, seed=args.seed,
+                            shard_size=args.shard_size, workers=args.workers)
+    print(f"{len(index['instances'])} instances written in {len(index['shards'])} shards to {args.out}")
@@ -1,5 +1,12 @@
 import numpy as np
-from collections import Counter
+
+from utils.helpers import GRADE_DTYPE, LABEL_DTYPE
+
+
+# Independent random streams of an instance
+LBD_STREAM, WEIGHTS_STREAM, BETAS_STREAM, GRADES_STREAM, NOISE_STREAM, NOISE_LEVEL_STREAM = range(6)
+# Students classified at once
+CLASSIFIER_CHUNK = 2**16
 
 
 class GradesGenerator():
@@ -7,7 +14,7 @@ class GradesGenerator():
         self.noise = noise
         self.seed = seed
         if seed is None:
-            self.seed = np.random.random_integers(1,100)
+            self.seed = np.random.randint(1, 101)
         self.size = size
         self.lbd = lbd
         self.nb_grades = nb_grades
@@ -15,7 +22,7 @@ class GradesGenerator():
         if nb_class is None:
             self.nb_class = 1
         if lbd is None:
-            rng = np.random.default_rng(self.seed)
+            rng = self.rng(LBD_STREAM)
             self.lbd = rng.uniform(0.2, 0.8)
         self.weights = weights
         if weights is None:
@@ -24,16 +31,26 @@ class GradesGenerator():
         if betas is None:
             self.betas = self.generate_betas()
         if noise is None:
-            rng = np.random.default_rng(self.seed)
+            rng = self.rng(NOISE_LEVEL_STREAM)
             self.noise = rng.uniform(0.01, 0.1)
 
+    def rng(self, stream: int):
+        """
+        Random generator of one stream of the instance, spawned independently from the seed
+        (an int or a np.random.SeedSequence, see factory.py)
+        Returns :
+               rng (np.random.Generator) : random generator of the stream
+        """
+        seed = self.seed if isinstance(self.seed, np.random.SeedSequence) else np.random.SeedSequence(int(self.seed))
+        return np.random.default_rng(np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (stream,)))
+
     def generate_weights(self):
         """
         Generate weights based on a normal distribution
         Returns :
                weights (array<float>) : weights between 0 and 1 
         """
-        rng = np.random.default_rng(self.seed)
+        rng = self.rng(WEIGHTS_STREAM)
         weights = abs(rng.standard_normal(self.nb_grades))
         weights /= weights.sum()
         return weights
@@ -44,7 +61,7 @@ class GradesGenerator():
         Returns :
                betas (array<int>) : frontiers of grade
         """
-        rng = np.random.default_rng(self.seed)
+        rng = self.rng(BETAS_STREAM)
         if self.nb_class == 1: #Simple case
             betas = rng.integers(low=8, high=15, size=self.nb_grades)
         else: #Multi class case
@@ -59,62 +76,43 @@ class GradesGenerator():
 
     def classifier(self, grades):
         """
-        Classifies grades
+        Classifies grades, by chunks of students to bound the memory of the scores
         Returns :
-               admissions (array<bool>) : True or False based on admission
+               admissions (array<int8>) : class of each student, 1 (Accepted) or 0 (Rejected) with 1 class
         """
-        # TODO: adding admission based on nb_class
-        
-        if self.nb_class == 1: # Only 1 class (Accepted) the other student are automatically rejected
-            if self.noise > 0:
-                #print('Adding {:.2f} % of noise'.format(self.noise*100)) 
-                admissions = []
-                for grade in grades: 
-                    tirage = np.random.binomial(1, self.noise)
-                    if tirage:
-                        admissions += [((grade >= self.betas)*self.weights).sum() <= self.lbd]
-                    else:
-                        admissions += [((grade >= self.betas)*self.weights).sum() >= self.lbd]
-                admissions = np.array(admissions)
-            else: 
-                admissions = np.array([((grade >= self.betas)*self.weights).sum() >= self.lbd for grade in grades])
+        rng = self.rng(NOISE_STREAM)
+        grades = np.asarray(grades)
+        if self.noise > 0:
+            tirages = rng.binomial(1, self.noise, size=len(grades)).astype(bool)
+            if self.nb_class > 1:
+                random_classes = rng.integers(low=0, high=self.nb_class+1, size=len(grades)).astype(LABEL_DTYPE)
 
-        else: #Mutli class
-            rng = np.random.default_rng(self.seed)
-            if self.noise > 0:
-                #print('Adding {:.2f} % of noise'.format(self.noise*100)) 
-                admissions = []
-                for grade in grades: 
-                    tirage = np.random.binomial(1, self.noise)
-                    if tirage:
-                        #admissions += [rng.integers(low=0, high = self.nb_class+1)] #Random class if tirage
-                        admissions += [np.random.randint(self.nb_class+1)]
-                    else:
-                        c = 0
-                        while ((grade >= self.betas[c])*self.weights).sum() >= self.lbd and c < self.nb_class:
-                            c += 1
-                        admissions += [c]
-                admissions = np.array(admissions)
-            else: 
-                admissions = []
-                for grade in grades:
-                    c = 0
-                    while ((grade >= self.betas[c])*self.weights).sum() >= self.lbd and c < self.nb_class:
-                        c += 1
-                    admissions += [c]
-                admissions = admissions = np.array(admissions)
+        admissions = np.empty(len(grades), dtype=LABEL_DTYPE)
+        for start in range(0, len(grades), CLASSIFIER_CHUNK):
+            block = slice(start, start + CLASSIFIER_CHUNK)
+            if self.nb_class == 1: # Only 1 class (Accepted) the other student are automatically rejected
+                scores = ((grades[block] >= self.betas)*self.weights).sum(axis=1)
+                labels = scores >= self.lbd
+                if self.noise > 0:
+                    labels = np.where(tirages[block], scores <= self.lbd, labels)
+            else: #Mutli class
+                # A student is in class c if it reaches the first c frontiers
+                scores = ((grades[block, None, :] >= self.betas[None, :self.nb_class, :])*self.weights).sum(axis=-1)
+                labels = np.cumprod(scores >= self.lbd, axis=1).sum(axis=1)
+                if self.noise > 0:
+                    labels = np.where(tirages[block], random_classes[block], labels) #Random class if tirage
+            admissions[block] = labels
         return admissions
 
-
     def generate_grades(self):
         """
         Generate grades based on a uniform distribution between 0 and 20 
         Returns :
-              grades (array<array<int>>) : grades of students
-              admissions (array<bool>) : True or False based on admission
+              grades (array<array<uint8>>) : grades of students
+              admissions (array<int8>) : class of each student
         """
-        rng = np.random.default_rng(self.seed)
-        grades = rng.integers(low=0, high=21, size=(self.size, self.nb_grades))
+        rng = self.rng(GRADES_STREAM)
+        grades = rng.integers(low=0, high=21, size=(self.size, self.nb_grades), dtype=GRADE_DTYPE)
         admissions = self.classifier(grades)
         return grades, admissions
     
@@ -125,14 +123,15 @@ class GradesGenerator():
             None
         """
         print('---------Analyze----------')
-        if admissions == None:
+        if admissions is None:
             print(f"Lambda: {self.lbd}")
             print(f"Weights: {self.weights}")
             print(f"Betas: {self.betas}")
             grades, admissions = self.generate_grades()
         else: 
             admissions = admissions
-        d = dict(Counter(admissions))
+        classes, counts = np.unique(np.asarray(admissions), return_counts=True)
+        d = {int(c): int(count) for c, count in zip(classes, counts)}
         print(f"Got-in: {d}")
 
         percentage = {}
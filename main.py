@@ -1,10 +1,12 @@
 import numpy as np 
-import pandas as pd
 import sys
 sys.path.append('./')
 
 from generator import GradesGenerator
-from models import MRSort_Solver, SAT_Solver, Max_SAT_Solver
+from models import SAT_Solver, Max_SAT_Solver
+from ensemble import MRSort_Ensemble, BACKENDS
+from planner import plan
+from portfolio import race
 
 from utils.argument import parse_arguments
 from utils.helpers import read_data_csv
@@ -18,6 +20,10 @@ if __name__ == '__main__':
     model = args.model
     seed = args.seed
     csv = args.csv
+    lazy = args.lazy
+    ensemble = args.ensemble
+    if ensemble > 0 and model not in BACKENDS + ('auto',):
+        raise SystemExit(f"--ensemble needs a --model among {', '.join(BACKENDS)} or auto, not {model}")
 
     if csv == '':
         gen = GradesGenerator(size=size, nb_grades=nb_grades,noise=noise,seed=seed, nb_class=nb_class)
@@ -28,22 +34,49 @@ if __name__ == '__main__':
         gen = GradesGenerator(size=size, nb_grades=nb_grades,noise=noise, seed=seed, nb_class=nb_class)
         gen.analyze_gen(admission)
 
-    if model == 'MILP':
-        MRSort_solv = MRSort_Solver(gen)
+    if model == 'auto':
+        decision = plan(grades, admission, nb_class)
+        model, lazy = decision['model'], decision['lazy']
+
+    if ensemble > 0:
+        if csv == '':
+            grades, admission = gen.generate_grades()
+        bagging = MRSort_Ensemble(gen, backend=model, n_estimators=ensemble, sample_size=args.sample_size)
+        bagging.fit(grades, admission)
+        f1_score_, accuracy_, time_, error_rate = bagging.get_results(grades, admission)
+    elif model == 'portfolio':
+        result = race(grades, admission, nb_class, deadline=args.deadline, encoding=args.encoding)
+    elif model == 'MILP':
+        from milp import MRSort_Solver
         if csv != '':
-            MRSort_solv = MRSort_Solver(gen,grades=grades, admission=admission)
+            MRSort_solv = MRSort_Solver(gen,grades=grades, admission=admission, lazy=lazy)
+        else:
+            MRSort_solv = MRSort_Solver(gen, lazy=lazy)
         MRSort_solv.set_constraint('MaxMin')
         MRSort_solv.solve()
         f1_score_, accuracy_, time_, error_count = MRSort_solv.get_results()
+    elif model == 'alternating':
+        from milp import MRSort_Alternating
+        Alt_solv = MRSort_Alternating(gen, grades=grades, admission=admission)
+        Alt_solv.solve()
+        f1_score_, accuracy_, time_, error_rate = Alt_solv.get_results()
+    elif model == 'enumerative':
+        from enumerative import Enumerative_Solver
+        Enum_solv = Enumerative_Solver(gen, grades=grades, admission=admission)
+        Enum_solv.solve()
+        f1_score_, accuracy_, time_, error_rate = Enum_solv.get_results()
     elif model == 'SAT': 
         grades,admissions = gen.generate_grades()
         SAT_Solv = SAT_Solver(generator=gen)
-        SAT_Solv.init_clauses(grades,admissions)
+        if lazy:
+            SAT_Solv.init_clauses_lazy(grades,admissions)
+        else:
+            SAT_Solv.init_clauses(grades,admissions)
         f1_score_, accuracy_, time_, error_rate = SAT_Solv.get_results(grades,admissions)
     elif model == 'Max-SAT': 
         grades,admissions = gen.generate_grades()
         Max_SAT_Solv = Max_SAT_Solver(generator=gen)
-        Max_SAT_Solv.init_clauses(grades,admissions)
+        Max_SAT_Solv.init_clauses(grades,admissions,encoding=args.encoding)
         f1_score_, accuracy_, time_, error_rate = Max_SAT_Solv.get_results(grades,admissions)
     else:
         print("Please choose model between ['']")
\ No newline at end of file
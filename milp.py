@@ -0,0 +1,647 @@
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from gurobipy import *
+
+from models import MAX_GRADE
+from utils.metrics import f1_score, accuracy_score
+
+
+class MRSort_Solver:
+    def __init__(self, generator, epsilon: float = 1e-4, M: int = 1e2, admission=None, grades=None, lazy: bool = False, seed_size: int = 100, batch_size: int = 100, env=None):
+        """
+        Initialize the solver
+        With lazy=True only seed_size students are materialised in the model, the students
+        misclassified by the incumbent are then added by batches of batch_size in solve
+        env (gurobipy.Env) : environment to build the model in, e.g. kept warm by a worker
+        """
+        self.gen = generator
+        if admission is None:
+            self.grades, self.admission = generator.generate_grades()
+        else:
+            self.grades, self.admission = np.array(grades), np.array(admission)
+        self.model = Model("MR-sort", env=env)
+
+        # Constants
+        self.size = self.gen.size
+        self.nb_grades = self.gen.nb_grades
+        self.epsilon = epsilon
+        self.M = M
+        self.lazy = lazy
+        self.seed_size = seed_size
+        self.batch_size = batch_size
+
+        # time to solve
+        self.time = None
+
+        # Students whose variables and constraints are in the model
+        self.materialised = np.zeros(self.size, dtype=bool)
+        self.objective = None
+        self.margins = []  # margin of every materialised student, for the Sum objective
+        self.sum_constr = None
+        # Variables of the first block of students, every student unless lazy, used by check_constraint
+        self.A, self.R, self.weights_, self.deltas = None, None, None, None
+
+        # ----- Gurobi variables ----
+        self.obj = self.model.addVar()  # Sum(Sigma_s) objective
+
+        # weights
+        self.weights = self.model.addMVar(shape=self.nb_grades, lb=0, ub=1)
+        # betas
+        self.betas = self.model.addMVar(shape=(self.nb_grades))
+        # lambda
+        self.lbd = self.model.addVar(lb=0.1, ub=1)
+
+    def set_constraint(self, objective):
+        """
+        Set the contraints of the model, please refer to the README.md for more details
+        """
+        if objective not in ('MaxMin', 'Sum'):
+            print('Error objective should be MaxMin or Sum')
+        self.objective = objective
+
+        # Weights sum equals 1
+        self.model.addConstr(
+            quicksum(self.weights[k] for k in range(self.nb_grades)) == 1)
+
+        if self.lazy:
+            rng = np.random.default_rng(self.gen.seed)
+            students = rng.choice(self.size, size=min(self.seed_size, self.size), replace=False)
+        else:
+            students = np.arange(self.size)
+        self.add_students(students)
+
+    def add_students(self, students):
+        """
+        Add the variables and the constraints of a block of students to the model
+        """
+        n = len(students)
+        grades = self.grades[students]
+        admission = self.admission[students]
+        self.materialised[students] = True
+
+        # ----- Gurobi variables ----
+        # sigmas for each student (in A*)
+        A = self.model.addMVar(shape=n, lb=0, ub=0.5)
+        # sigmas for each student (in R*)
+        R = self.model.addMVar(shape=n, lb=0,  ub=0.5)
+        # student weights
+        weights_ = self.model.addMVar(shape=(n, self.nb_grades), lb=0, ub=1)
+        # delta
+        deltas = self.model.addMVar(shape=(n, self.nb_grades), vtype=GRB.BINARY)
+        if self.A is None:
+            self.A, self.R, self.weights_, self.deltas = A, R, weights_, deltas
+
+        # Margins in A*
+        self.model.addConstrs((
+            quicksum(weights_[j, i] for i in range(
+                self.nb_grades)) - self.lbd - A[j] == 0
+        ) for j in range(n) if admission[j] == True
+        )
+
+        # Margins in R*
+        self.model.addConstrs((
+            quicksum(weights_[j, i] for i in range(
+                self.nb_grades)) - self.lbd + R[j] == - self.epsilon
+        ) for j in range(n) if admission[j] == False
+        )
+
+        # Grades and betas-frontiers
+        self.model.addConstrs((
+            (self.M*(deltas[j, :] - np.ones(self.nb_grades)) <= grades[j, :] - self.betas))
+            for j in range(n))
+
+        self.model.addConstrs((
+            grades[j, :] - self.betas <= self.M*deltas[j, :] - self.epsilon*np.ones(self.nb_grades))
+            for j in range(n))
+
+        # Weights constraint
+        self.model.addConstrs((
+            self.weights >= weights_[j])
+            for j in range(n)
+        )
+
+        # Delta constraints
+        self.model.addConstrs((
+            deltas[j] >= weights_[j])
+            for j in range(n)
+        )
+
+        self.model.addConstrs((
+            weights_[j] >= deltas[j] + self.weights - np.ones(self.nb_grades))
+            for j in range(n)
+        )
+
+        if self.objective == 'MaxMin':
+            # Objective is the min margin
+            self.model.addConstrs((self.obj <= A[j]) for j in range(
+                n) if admission[j] == True)
+            self.model.addConstrs((self.obj <= R[j]) for j in range(
+                n) if admission[j] == False)
+        elif self.objective == 'Sum':
+            # Objective is the sum of margins in A* and R*, rebuilt with the new students
+            self.margins += [A[j] if admission[j] == True else R[j] for j in range(n)]
+            if self.sum_constr is not None:
+                self.model.remove(self.sum_constr)
+            self.sum_constr = self.model.addConstr(self.obj == quicksum(self.margins))
+
+    def predict(self, grades):
+        """
+        Classify students with the current solution, as the constraints do: a criterion is passed
+        if grade >= beta and a student accepted if the sum of its weights >= lambda, the other side
+        being epsilon below (decided halfway, epsilon must be above the tolerances of Gurobi)
+        Returns :
+            results (array<bool>): True or False based on admission
+        """
+        passed = np.asarray(grades) >= self.betas.X - self.epsilon/2
+        return (passed * self.weights.X).sum(axis=1) >= self.lbd.X - self.epsilon/2
+
+    def parameters(self):
+        """
+        MR-Sort parameters of the solution in the convention of the other learners: grade > betas
+        and sum of weights > lambda
+        Returns :
+            params (dict) : weights, betas and lambda
+        """
+        return {'weights': self.weights.X.tolist(), 'betas': (self.betas.X - self.epsilon/2).tolist(),
+                'lambda': self.lbd.X - self.epsilon/2}
+
+    def solve(self, time_limit: float = None, threads: int = None, verbose: int = 1):
+        """
+        Solve the model
+        In lazy mode, re-optimize after adding the students misclassified by the incumbent
+        until every student is correctly classified
+        Args:
+            time_limit (float) : time limit in seconds of the whole solve (every round in lazy mode),
+                the incumbent is kept
+            threads (int) : number of threads of Gurobi, all the cores by default
+            verbose (bool) : whether to print or not the number of materialised students
+        """
+        start = time.time()
+        deadline = None if time_limit is None else start + time_limit
+        self.model.update()
+        self.model.setObjective(self.obj, GRB.MAXIMIZE)
+        self.model.params.outputflag = 0  # 0 means without verbose
+        if time_limit is not None:
+            self.model.params.TimeLimit = time_limit
+        if threads is not None:
+            self.model.params.Threads = threads
+        self.model.optimize()
+        while self.lazy and self.model.SolCount > 0:
+            violated = self.predict(self.grades) != self.admission.astype(bool)
+            missing = np.flatnonzero(violated & ~self.materialised)
+            if len(missing) == 0:
+                if violated.any():
+                    print(f"WARNING: {violated.sum()} students of the model are misclassified, "
+                          f"epsilon={self.epsilon} is within the tolerances of Gurobi")
+                break
+            if deadline is not None:
+                if time.time() >= deadline:
+                    break
+                self.model.params.TimeLimit = deadline - time.time()
+            self.add_students(missing[:self.batch_size])
+            self.model.optimize()
+        end = time.time()
+        self.time = end - start
+        if self.lazy and verbose == 1:
+            print(f"Materialised students: {self.materialised.sum()}/{self.size}")
+
+    def get_results(self, verbose: int = 1):
+        """
+        Print results of the solver
+        Returns :
+            f1_score_ (float): f1-score of the solution
+            accuracy_ (float): accuracy of the solution
+            time (float): time spent trying to find the optimum
+            error_count (int): 1/0 based on if gurobi converges or not 
+        """
+        try:
+            results = self.predict(self.grades)
+            f1_score_ = f1_score((self.admission).astype(bool), results)
+            accuracy_ = sum([results[i] ==(self.admission).astype(bool)[i]
+                            for i in range(len(results))])/len(results)
+
+            if verbose == 1:
+                print(f"results:\n")
+                print(f"Objective: {self.obj.X}")
+                print(f"Lambda: {self.lbd.X}")
+                print(f"Weights: {self.weights.X}")
+                print(f"Betas: {self.betas.X}")
+                print(f"Results: {dict(Counter(results))}")
+                print("Ran in: {:.2f} seconds ".format(self.time))
+                print("Precision: {:.2f} %".format(accuracy_*100))
+                print("F1-score:  {:.2f} %".format(f1_score_*100))
+            error_count = 0
+            return f1_score_, accuracy_, self.time, error_count
+
+        except GurobiError:
+            print("WARNING: Gurobi didn't find a solution")
+            error_count = 1
+            return 0, 0, 0, error_count
+
+    def check_constraint(self):
+        """
+        Check if contraints are respected - debug function
+        """
+        if not self.materialised.all():
+            raise ValueError('check_constraint needs every student in the model, solve without lazy')
+        # Margins in A* == 0
+        print([(sum(self.weights_.X[j, i] for i in range(self.nb_grades)) - self.lbd.X -
+              self.A.X[j]) == 0 for j in range(self.size) if self.admission[j] == True])
+        # Margins in R* == -epsilon
+        print([(sum(self.weights_.X[j, i] for i in range(self.nb_grades)) - self.lbd.X + self.R.X[j])
+              == - self.epsilon for j in range(self.size) if self.admission[j] == False])
+
+        # Grades and beta frontier >= 0
+        print([-(self.M*(self.deltas.X[j, :] - np.ones(self.nb_grades)) -
+              self.grades[j, :] + self.betas.X) >= 0 for j in range(self.size)])
+        print([-(self.grades[j, :] - self.betas.X - self.M*self.deltas.X[j, :] +
+              self.epsilon*np.ones(self.nb_grades)) >= 0 for j in range(self.size)])
+
+        # Weights constraint >=0 (=0 ou 1)
+        print([(self.weights.X - self.weights_.X[j])
+              >= 0 for j in range(self.size)])
+
+        # Delta constraints >=0
+        print([(self.deltas.X[j] - self.weights_.X[j])
+              >= 0 for j in range(self.size)])
+        print([(self.weights_.X[j] - self.deltas.X[j] - self.weights.X +
+              np.ones(self.nb_grades)) >= 0 for j in range(self.size)])
+
+
+class MRSort_Template(MRSort_Solver):
+    def __init__(self, generator, objective: str = 'MaxMin', epsilon: float = 1e-4, M: int = 1e2, admission=None, grades=None, env=None):
+        """
+        Initialize a reusable model for every dataset of generator.size students and generator.nb_grades grades
+        The structure is built once, each dataset given to set_data only updates the right-hand
+        sides of the big-M rows and which margin of each student (A* or R*) is free
+        """
+        super().__init__(generator, epsilon=epsilon, M=M, admission=admission, grades=grades, env=env)
+        self.set_constraint(objective)
+
+    def set_constraint(self, objective):
+        """
+        Build the constraints of every student with placeholder data, then load the dataset
+        """
+        if objective not in ('MaxMin', 'Sum'):
+            print('Error objective should be MaxMin or Sum')
+        self.objective = objective
+        n = self.size
+        self.materialised[:] = True
+
+        self.model.addConstr(
+            quicksum(self.weights[k] for k in range(self.nb_grades)) == 1)
+
+        # ----- Gurobi variables ----
+        # Both margins of every student, the one of the other class is fixed to 0 by set_data
+        self.A = self.model.addMVar(shape=n, lb=0, ub=0.5)
+        self.R = self.model.addMVar(shape=n, lb=0, ub=0.5)
+        self.weights_ = self.model.addMVar(shape=(n, self.nb_grades), lb=0, ub=1)
+        self.deltas = self.model.addMVar(shape=(n, self.nb_grades), vtype=GRB.BINARY)
+        self.model.update()
+        first = self.model.NumConstrs
+
+        # Margins: 0 in A* and -epsilon in R*
+        self.model.addConstrs((
+            quicksum(self.weights_[j, i] for i in range(
+                self.nb_grades)) - self.lbd - self.A[j] + self.R[j] == 0
+        ) for j in range(n))
+
+        # Grades and betas-frontiers: grades + M and -grades - epsilon
+        self.model.addConstrs((
+            self.M*self.deltas[j, :] + self.betas <= np.zeros(self.nb_grades))
+            for j in range(n))
+
+        self.model.addConstrs((
+            - self.betas - self.M*self.deltas[j, :] <= np.zeros(self.nb_grades))
+            for j in range(n))
+
+        self.model.update()
+        rows = self.model.getConstrs()[first:]
+        self.margin_rows = rows[:n]
+        self.low_rows = rows[n:n + n*self.nb_grades]
+        self.high_rows = rows[n + n*self.nb_grades:]
+
+        # Weights constraint
+        self.model.addConstrs((
+            self.weights >= self.weights_[j])
+            for j in range(n)
+        )
+
+        # Delta constraints
+        self.model.addConstrs((
+            self.deltas[j] >= self.weights_[j])
+            for j in range(n)
+        )
+
+        self.model.addConstrs((
+            self.weights_[j] >= self.deltas[j] + self.weights - np.ones(self.nb_grades))
+            for j in range(n)
+        )
+
+        if self.objective == 'MaxMin':
+            # The margin of the other class is 0, so the min margin is min(A + R)
+            self.model.addConstrs((self.obj <= self.A[j] + self.R[j]) for j in range(n))
+        elif self.objective == 'Sum':
+            self.sum_constr = self.model.addConstr(
+                self.obj == quicksum(self.A[j] + self.R[j] for j in range(n)))
+
+        self.set_data(self.grades, self.admission)
+
+    def set_data(self, grades, admission, warm_start: bool = True):
+        """
+        Load a dataset of the same shape in the model
+        Args:
+            warm_start (bool) : start the next optimization from the weights, betas and lambda of the last solution
+        """
+        grades = np.asarray(grades)
+        if grades.shape != (self.size, self.nb_grades):
+            raise ValueError(f'Expected grades of shape {(self.size, self.nb_grades)}, got {grades.shape}')
+        start = None
+        if warm_start and self.model.SolCount > 0:
+            start = self.weights.X, self.betas.X, self.lbd.X
+        self.grades, self.admission = grades, np.asarray(admission)
+        accepted = self.admission.astype(bool)
+
+        self.model.setAttr('RHS', self.margin_rows, np.where(accepted, 0, -self.epsilon).tolist())
+        self.model.setAttr('UB', self.A.tolist(), np.where(accepted, 0.5, 0).tolist())
+        self.model.setAttr('UB', self.R.tolist(), np.where(accepted, 0, 0.5).tolist())
+        self.model.setAttr('RHS', self.low_rows, (grades + float(self.M)).ravel().tolist())
+        self.model.setAttr('RHS', self.high_rows, (- (grades + self.epsilon)).ravel().tolist())
+        if start is not None:
+            self.weights.Start, self.betas.Start, self.lbd.Start = start
+
+
+def lp_step(grades, accepted, frontiers, objective, epsilon, env=None):
+    """
+    Best weights and lambda for fixed frontiers: the margins of MRSort_Solver over the distinct
+    (coalition, class) rows, signed so that the LP stays feasible when some students can't be separated
+    Returns :
+        weights (array<float>) : weights
+        lbd (float) : lambda, lowered by epsilon/2 so that the margins hold with a strict comparison
+    """
+    nb_grades = grades.shape[1]
+    masks = ((grades >= frontiers) << np.arange(nb_grades)).sum(axis=1)
+    rows, counts = np.unique(np.column_stack([masks, accepted]), axis=0, return_counts=True)
+
+    model = Model("MR-sort LP", env=env)
+    model.params.outputflag = 0
+    obj = model.addVar(lb=-GRB.INFINITY)
+    weights = model.addMVar(shape=nb_grades, lb=0, ub=1)
+    lbd = model.addVar(lb=0.1, ub=1)
+    # Margin of each row, in A* for the accepted students and in R* for the rejected ones
+    margins = model.addMVar(shape=len(rows), lb=-1, ub=0.5)
+    model.addConstr(quicksum(weights[k] for k in range(nb_grades)) == 1)
+    for r, (mask, label) in enumerate(rows):
+        coalition = quicksum(weights[i] for i in range(nb_grades) if mask >> i & 1)
+        if label:
+            model.addConstr(coalition - lbd - margins[r] == 0)
+        else:
+            model.addConstr(coalition - lbd + margins[r] == - epsilon)
+    if objective == 'MaxMin':
+        model.addConstrs((obj <= margins[r]) for r in range(len(rows)))
+    else:
+        model.addConstr(obj == quicksum(counts[r]*margins[r] for r in range(len(rows))))
+    model.setObjective(obj, GRB.MAXIMIZE)
+    model.optimize()
+    return weights.X, lbd.X - epsilon/2
+
+
+def best_threshold(values, positive, counts, low=None):
+    """
+    Best threshold x over the rows: a positive row is correct if its value < x, a negative one if
+    its value >= x. Thresholds are taken halfway between the distinct values (and around them)
+    Args:
+        low (float) : smallest allowed threshold
+    Returns :
+        x (float) : threshold
+        correct (int) : number of correctly classified students
+    """
+    distinct = np.unique(values)
+    candidates = np.concatenate([[distinct[0] - 1], (distinct[:-1] + distinct[1:])/2, [distinct[-1] + 1]])
+    if low is not None:
+        candidates = np.unique(np.maximum(candidates, low))
+    below = []
+    for side in (positive, ~positive):
+        order = np.argsort(values[side])
+        # number of students of the side with a value below each candidate
+        total = np.concatenate([[0], np.cumsum(counts[side][order])])
+        below.append(total[np.searchsorted(values[side][order], candidates)])
+    # positive rows below x, negative rows at or above x
+    correct = below[0] + counts[~positive].sum() - below[1]
+    best = correct.argmax()
+    return candidates[best], int(correct[best])
+
+
+def sweep_step(profiles, accepted, counts, weights, lbd, frontiers):
+    """
+    Local search of the MR-Sort parameters: the best frontier and weight of each criterion
+    together (every frontier, and for each one the best weight with a sweep of the thresholds), then
+    the best lambda, until the accuracy stops improving. Weights are not normalized during the search
+    Args:
+        profiles (array<array<int>>) : distinct rows of grades, with the class accepted and the number
+            of students counts of each row
+    Returns :
+        weights (array<float>) : weights
+        lbd (float) : a student is accepted if the sum of the weights of the criteria it passes > lbd
+        frontiers (array<int>) : a student passes criterion i if its grade is >= frontiers[i]
+        correct (int) : number of correctly classified students
+    """
+    weights, frontiers = np.array(weights, dtype=float), frontiers.copy()
+    passed = profiles >= frontiers
+    correct = int(counts[((passed * weights).sum(axis=1) > lbd) == accepted].sum())
+    while True:
+        previous = correct
+        for i in range(profiles.shape[1]):
+            others = (passed * weights).sum(axis=1) - passed[:, i]*weights[i]
+            fixed = counts * ((others > lbd) == accepted)
+            for frontier in range(MAX_GRADE+1):
+                above = profiles[:, i] >= frontier
+                base = int(fixed[~above].sum())
+                if above.any():
+                    # passing rows are accepted if their weight > lbd - others
+                    weight, score = best_threshold(lbd - others[above], accepted[above], counts[above], low=0)
+                else:
+                    weight, score = weights[i], 0
+                if base + score > correct:
+                    correct, frontiers[i], weights[i] = base + score, frontier, weight
+            passed[:, i] = profiles[:, i] >= frontiers[i]
+        # a rejected row is correct if its score <= lbd
+        lbd_, score = best_threshold((passed * weights).sum(axis=1), ~accepted, counts)
+        if score > correct:
+            correct, lbd = score, lbd_
+        if correct <= previous:
+            return weights, lbd, frontiers, correct
+
+
+def descend(profiles, accepted, counts, frontiers, objective, epsilon, env, weights=None, lbd=None):
+    """
+    Alternate the LP (lp_step) and the local search (sweep_step) until the accuracy stops improving,
+    starting from the LP of the frontiers, or from weights and lbd when given
+    Returns :
+        best (tuple) : (number of correctly classified students, weights, lambda, frontiers)
+    """
+    best = (-1, None, None, None)
+    while True:
+        if weights is None:
+            weights, lbd = lp_step(np.repeat(profiles, counts, axis=0), np.repeat(accepted, counts),
+                                   frontiers, objective, epsilon, env)
+        weights, lbd, frontiers, correct = sweep_step(profiles, accepted, counts, weights, lbd, frontiers)
+        if correct <= best[0]:
+            return best
+        best = (correct, weights, lbd, frontiers)
+        if correct == counts.sum():
+            return best
+        weights = None
+
+
+def alternate(args):
+    """
+    Descend from one start, then from kicks of the best model: its frontiers moved by up to 3 grades
+    on random criteria and random weights, until kicks kicks in a row don't improve the accuracy
+    Returns :
+        best (tuple) : (number of correctly classified students, weights, lambda, frontiers)
+    """
+    profiles, accepted, counts, frontiers, objective, epsilon, kicks, seed, deadline = args
+    env = Env(empty=True)
+    env.setParam('OutputFlag', 0)
+    env.start()
+    rng = np.random.default_rng(seed)
+    best = descend(profiles, accepted, counts, frontiers, objective, epsilon, env)
+    failures = 0
+    while failures < kicks and best[0] < counts.sum() and (deadline is None or time.time() < deadline):
+        moved = rng.random(len(frontiers)) < 0.5
+        frontiers = np.clip(best[3] + moved*rng.integers(-3, 4, size=len(frontiers)), 0, MAX_GRADE)
+        weights = rng.dirichlet(np.ones(len(frontiers)))
+        lbd, _ = best_threshold(((profiles >= frontiers) * weights).sum(axis=1), ~accepted, counts)
+        result = descend(profiles, accepted, counts, frontiers, objective, epsilon, env, weights, lbd)
+        if result[0] > best[0]:
+            best, failures = result, 0
+        else:
+            failures += 1
+    return best
+
+
+class MRSort_Alternating:
+    def __init__(self, generator, admission=None, grades=None, objective: str = 'MaxMin', n_starts: int = 8,
+                 kicks: int = 10, epsilon: float = 1e-4, workers: int = None):
+        """
+        Initialize the solver
+        Heuristic for large datasets: alternate the LP over the weights and lambda for fixed betas
+        (lp_step) and a local search of the betas, weights and lambda (sweep_step), from several
+        starts in parallel, each one kicked out of its local optima (alternate)
+        Args:
+            objective (str) : MaxMin or Sum, objective of the LP, as in MRSort_Solver
+            n_starts (int) : number of starts, the first one at the median grades and the others random
+            kicks (int) : a start stops after this number of kicks in a row without improvement
+            workers (int) : number of worker processes, all the cores by default (1 runs in process)
+        """
+        self.gen = generator
+        if admission is None:
+            self.grades, self.admission = generator.generate_grades()
+        else:
+            self.grades, self.admission = np.array(grades), np.array(admission)
+        if self.gen.nb_class != 1:
+            raise ValueError('MRSort_Alternating only handles 2 classes')
+        if objective not in ('MaxMin', 'Sum'):
+            print('Error objective should be MaxMin or Sum')
+        self.objective = objective
+        self.n_starts = n_starts
+        self.kicks = kicks
+        self.epsilon = epsilon
+        self.workers = workers
+
+        self.weights, self.betas, self.lbd = None, None, None
+        self.time = None
+
+    def solve(self, time_limit: float = None):
+        """
+        Run the starts in parallel and keep the most accurate model
+        Args:
+            time_limit (float) : no start begins a new kick after this time in seconds
+        """
+        start = time.time()
+        deadline = None if time_limit is None else start + time_limit
+        rng = np.random.default_rng(self.gen.seed)
+        low, high = self.grades.min(axis=0), self.grades.max(axis=0) + 1
+        starts = [np.median(self.grades, axis=0).round().astype(int)]
+        starts += [rng.integers(low, high + 1) for _ in range(self.n_starts - 1)]
+        # Students with the same grades and class are one row of the local search
+        rows, counts = np.unique(np.column_stack([self.grades, self.admission.astype(bool)]), axis=0, return_counts=True)
+        profiles, accepted = rows[:, :-1].astype(int), rows[:, -1].astype(bool)
+        seeds = rng.integers(2**32, size=len(starts))
+        jobs = [(profiles, accepted, counts, frontiers, self.objective, self.epsilon, self.kicks, int(seed), deadline)
+                for frontiers, seed in zip(starts, seeds)]
+        if self.workers == 1:
+            results = [alternate(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(alternate, jobs))
+
+        _, weights, lbd, frontiers = max(results, key=lambda result: result[0])
+        # MR-Sort parameters as learned by MRSort_Solver: grade > betas and weights summing to 1
+        self.betas = frontiers - 0.5
+        if weights.sum() > 0:
+            self.weights, self.lbd = weights / weights.sum(), lbd / weights.sum()
+        else:  # every student in the same class
+            self.weights, self.lbd = np.full(len(weights), 1/len(weights)), 1. if lbd >= 0 else -1.
+        self.time = time.time() - start
+
+    def predict(self, grades):
+        """
+        Classify students with the solution
+        Returns :
+            results (array<bool>): True or False based on admission
+        """
+        return ((np.asarray(grades) > self.betas) * self.weights).sum(axis=1) > self.lbd
+
+    def get_results(self, verbose: int = 1):
+        """
+        Print results of the solver
+        Returns :
+            f1_score_ (float): f1-score of the solution
+            accuracy_ (float): accuracy of the solution
+            time (float): time spent alternating
+            error_rate (int): numer of misclassification
+        """
+        admission = self.admission.astype(bool)
+        results = self.predict(self.grades)
+        f1_score_ = f1_score(admission, results)
+        accuracy_ = accuracy_score(admission, results)
+        error_rate = int((results != admission).sum())
+        if verbose == 1:
+            print(f"Lambda: {self.lbd}")
+            print(f"Weights: {self.weights}")
+            print(f"Betas: {self.betas}")
+            print("Ran in: {:.2f} seconds ".format(self.time))
+            print("Precision: {:.2f} %".format(accuracy_*100))
+            print("F1-score:  {:.2f} %".format(f1_score_*100))
+            print(f"Error rate: {error_rate} errors")
+        return f1_score_, accuracy_, self.time, error_rate
+
+    def milp_gap(self, time_limit: float = 60, verbose: int = 1):
+        """
+        Compare the solution with the full MILP of MRSort_Solver on the same students (small instances)
+        Returns :
+            gap (dict) : accuracy and time of both solvers, and the accuracy lost by the alternation
+                (milp_accuracy, milp_time and gap are None when the MILP finds no solution)
+        """
+        milp = MRSort_Solver(self.gen, grades=self.grades, admission=self.admission)
+        milp.set_constraint(self.objective)
+        milp.solve(time_limit=time_limit)
+        _, milp_accuracy, milp_time, error_count = milp.get_results(verbose=0)
+        _, accuracy_, _, _ = self.get_results(verbose=0)
+        if error_count == 1:  # no MILP solution to compare with
+            milp_accuracy, milp_time = None, None
+        gap = {'accuracy': accuracy_, 'time': self.time,
+               'milp_accuracy': None if milp_accuracy is None else float(milp_accuracy),
+               'milp_time': milp_time, 'gap': None if milp_accuracy is None else float(milp_accuracy) - accuracy_}
+        if verbose == 1:
+            print("Alternating: {:.2f} % in {:.2f} seconds".format(accuracy_*100, self.time))
+            if gap['gap'] is None:
+                print("MILP:        no solution within {} seconds, no gap".format(time_limit))
+            else:
+                print("MILP:        {:.2f} % in {:.2f} seconds".format(milp_accuracy*100, milp_time))
+                print("Gap:         {:.2f} %".format(gap['gap']*100))
+        return gap
@@ -1,9 +1,7 @@
 import time
-from gurobipy import *
 import numpy as np
-from collections import Counter
-from utils.helpers import powerset, get_i2v
-from sklearn.metrics import f1_score, accuracy_score
+from utils.helpers import powerset, get_i2v, LABEL_DTYPE
+from utils.metrics import f1_score, accuracy_score
 import subprocess
 import platform
 
@@ -11,182 +9,115 @@ import platform
 MAX_GRADE = 21
 
 
-class MRSort_Solver:
-    def __init__(self, generator, epsilon: float = 1e-6, M: int = 1e2, admission=None, grades=None):
-        """
-        Initialize the solver
-        """
-        self.gen = generator
-        if admission is None:
-            self.grades, self.admission = generator.generate_grades()
-        else:
-            self.grades, self.admission = np.array(grades), np.array(admission)
-        self.model = Model("MR-sort")
-
-        # Constants
-        self.size = self.gen.size
-        self.nb_grades = self.gen.nb_grades
-        self.epsilon = epsilon
-        self.M = M
-
-        # time to solve
-        self.time = None
-
-        # ----- Gurobi variables ----
-        self.obj = self.model.addVar()  # Sum(Sigma_s) objective
-        # sigmas for each student (in A*)
-        self.A = self.model.addMVar(shape=self.size, lb=0, ub=0.5)
-        # sigmas for each student (in R*)
-        self.R = self.model.addMVar(shape=self.size, lb=0,  ub=0.5)
-
-        # weights
-        self.weights = self.model.addMVar(shape=self.nb_grades, lb=0, ub=1)
-        # betas
-        self.betas = self.model.addMVar(shape=(self.nb_grades))
-        # lambda
-        self.lbd = self.model.addVar(lb=0.1, ub=1)
-
-        # student weights
-        self.weights_ = self.model.addMVar(
-            shape=(self.size, self.nb_grades), lb=0, ub=1)
-        # delta
-        self.deltas = self.model.addMVar(
-            shape=(self.size, self.nb_grades), vtype=GRB.BINARY)
-
-    def set_constraint(self, objective):
-        """
-        Set the contraints of the model, please refer to the README.md for more details
-        """
-
-        # Margins in A*
-        self.model.addConstrs((
-            quicksum(self.weights_[j, i] for i in range(
-                self.nb_grades)) - self.lbd - self.A[j] == 0
-        ) for j in range(self.size) if self.admission[j] == True
-        )
-
-        # Margins in R*
-        self.model.addConstrs((
-            quicksum(self.weights_[j, i] for i in range(
-                self.nb_grades)) - self.lbd + self.R[j] == - self.epsilon
-        ) for j in range(self.size) if self.admission[j] == False
-        )
-
-        # Grades and betas-frontiers
-        self.model.addConstrs((
-            (self.M*(self.deltas[j, :] - np.ones(self.nb_grades)) <= self.grades[j, :] - self.betas))
-            for j in range(self.size))
-
-        self.model.addConstrs((
-            self.grades[j, :] - self.betas <= self.M*self.deltas[j, :] - self.epsilon*np.ones(self.nb_grades))
-            for j in range(self.size))
-
-        # Weights constraint
-        self.model.addConstrs((
-            self.weights >= self.weights_[j])
-            for j in range(self.size)
-        )
-
-        # Weights sum equals 1
-        self.model.addConstr(
-            quicksum(self.weights[k] for k in range(self.nb_grades)) == 1)
-
-        # Delta constraints
-        self.model.addConstrs((
-            self.deltas[j] >= self.weights_[j])
-            for j in range(self.size)
-        )
-
-        self.model.addConstrs((
-            self.weights_[j] >= self.deltas[j] + self.weights - np.ones(self.nb_grades))
-            for j in range(self.size)
-        )
-
-        if objective == 'MaxMin':
-            # Objective is the min margin
-            self.model.addConstrs((self.obj <= self.A[j]) for j in range(
-                self.size) if self.admission[j] == True)
-            self.model.addConstrs((self.obj <= self.R[j]) for j in range(
-                self.size) if self.admission[j] == False)
-        elif objective == 'Sum':
-            # Objective is the sum of margins in A* and R*
-            self.model.addConstr(self.obj == quicksum(self.A[j] for j in range(self.size) if self.admission[j] == True)
-                                 + quicksum(self.R[j] for j in range(self.size) if self.admission[j] == False))
-        else:
-            print('Error objective should be MaxMin or Sum')
-
-    def solve(self):
-        """
-        Solve the model
-        """
-        start = time.time()
-        self.model.update()
-        self.model.setObjective(self.obj, GRB.MAXIMIZE)
-        self.model.params.outputflag = 0  # 0 means without verbose
-        self.model.optimize()
-        end = time.time()
-        self.time = end - start
-
-    def get_results(self, verbose: int = 1):
-        """
-        Print results of the solver
-        Returns :
-            f1_score_ (float): f1-score of the solution
-            accuracy_ (float): accuracy of the solution
-            time (float): time spent trying to find the optimum
-            error_count (int): 1/0 based on if gurobi converges or not 
-        """
-        try:
-            results = ((self.grades > self.betas.X) *
-                       self.weights.X).sum(axis=1) > self.lbd.X
-            f1_score_ = f1_score((self.admission).astype(bool), results)
-            accuracy_ = sum([results[i] ==(self.admission).astype(bool)[i]
-                            for i in range(len(results))])/len(results)
-
-            if verbose == 1:
-                print(f"results:\n")
-                print(f"Objective: {self.obj.X}")
-                print(f"Lambda: {self.lbd.X}")
-                print(f"Weights: {self.weights.X}")
-                print(f"Betas: {self.betas.X}")
-                print(f"Results: {dict(Counter(results))}")
-                print("Ran in: {:.2f} seconds ".format(self.time))
-                print("Precision: {:.2f} %".format(accuracy_*100))
-                print("F1-score:  {:.2f} %".format(f1_score_*100))
-            error_count = 0
-            return f1_score_, accuracy_, self.time, error_count
-
-        except GurobiError:
-            print("WARNING: Gurobi didn't find a solution")
-            error_count = 1
-            return 0, 0, 0, error_count
-
-    def check_constraint(self):
-        """
-        Check if contraints are respected - debug function
-        """
-        # Margins in A* == 0
-        print([(sum(self.weights_.X[j, i] for i in range(self.nb_grades)) - self.lbd.X -
-              self.A.X[j]) == 0 for j in range(self.size) if self.admission[j] == True])
-        # Margins in R* == -epsilon
-        print([(sum(self.weights_.X[j, i] for i in range(self.nb_grades)) - self.lbd.X + self.R.X[j])
-              == - self.epsilon for j in range(self.size) if self.admission[j] == False])
-
-        # Grades and beta frontier >= 0
-        print([-(self.M*(self.deltas.X[j, :] - np.ones(self.nb_grades)) -
-              self.grades[j, :] + self.betas.X) >= 0 for j in range(self.size)])
-        print([-(self.grades[j, :] - self.betas.X - self.M*self.deltas.X[j, :] +
-              self.epsilon*np.ones(self.nb_grades)) >= 0 for j in range(self.size)])
-
-        # Weights constraint >=0 (=0 ou 1)
-        print([(self.weights.X - self.weights_.X[j])
-              >= 0 for j in range(self.size)])
-
-        # Delta constraints >=0
-        print([(self.deltas.X[j] - self.weights_.X[j])
-              >= 0 for j in range(self.size)])
-        print([(self.weights_.X[j] - self.deltas.X[j] - self.weights.X +
-              np.ones(self.nb_grades)) >= 0 for j in range(self.size)])
+def sat_tables(d, nb_grades, nb_class):
+    """
+    Turn a decoded SAT/MaxSAT model into lookup tables
+    Args:
+        d (dict) : decoded model, as returned by solve
+        nb_grades (int) : number of criteria
+        nb_class (int) : number of classes
+    Returns :
+        alpha (array<bool>) : alpha[h-1, i, k] is True if grade k on criterion i is sufficient at level h
+        beta (array<bool>) : beta[mask] is True if the coalition encoded by the bitmask is sufficient
+    """
+    alpha = np.zeros((nb_class, nb_grades, MAX_GRADE), dtype=bool)
+    for i in range(nb_grades):
+        for k in range(MAX_GRADE):
+            if nb_class == 1:
+                alpha[0, i, k] = d[(i, k)]
+            else:
+                for h in range(1, nb_class+1):
+                    alpha[h-1, i, k] = d[(i, k, h)]
+    beta = np.zeros(2**nb_grades, dtype=bool)
+    for c in powerset(range(nb_grades)):
+        beta[sum(1 << i for i in c)] = d[frozenset(c)]
+    return alpha, beta
+
+
+def mrsort_tables(weights, betas, lbd):
+    """
+    Lookup tables of sat_tables for a MR-Sort model learned by MRSort_Solver
+    Returns :
+        alpha (array<bool>) : alpha[0, i, k] is True if grade k on criterion i is above the frontier
+        beta (array<bool>) : beta[mask] is True if the coalition encoded by the bitmask is a majority
+    """
+    betas = np.asarray(betas)
+    alpha = (np.arange(MAX_GRADE) > betas[:, None])[None]
+    masks = np.arange(2**len(betas))
+    members = (masks[:, None] >> np.arange(len(betas))) & 1
+    beta = (members * np.asarray(weights)).sum(axis=1) > lbd
+    return alpha, beta
+
+
+def monotone_closure(beta):
+    """
+    Smallest monotone coalition table above beta: a coalition containing a majority is a majority
+    Returns :
+        beta (array<bool>) : beta[mask] is True if a sub-coalition of mask is True in beta
+    """
+    beta = np.array(beta, dtype=bool)
+    masks = np.arange(len(beta))
+    for i in range(len(beta).bit_length() - 1):
+        without = masks[(masks >> i) & 1 == 0]
+        beta[without | (1 << i)] |= beta[without]
+    return beta
+
+
+def predict_tables(alpha, beta, grades):
+    """
+    Vectorized classification of all the students with the tables of sat_tables
+    Returns :
+        predicted (array<int>) : class of each student
+    """
+    grades = np.asarray(grades)
+    # masks[h, s] : coalition of the criteria passed by student s at level h
+    masks = np.zeros((alpha.shape[0], len(grades)), dtype=np.int32)
+    for i in range(grades.shape[1]):
+        masks |= alpha[:, i, grades[:, i]].astype(np.int32) << i
+    # A student reaches level h only if it reaches every level below
+    return np.cumprod(beta[masks], axis=0, dtype=LABEL_DTYPE).sum(axis=0, dtype=LABEL_DTYPE)
+
+
+def clauses_to_dimacs(clauses, numvar):
+    """
+    Serialize clauses in the DIMACS CNF format
+    """
+    dimacs = 'c This is it\np cnf ' + \
+        str(numvar)+' '+str(len(clauses))+'\n'
+    for clause in clauses:
+        for atom in clause:
+            dimacs += str(atom) + ' '
+        dimacs += '0\n'
+    return dimacs
+
+
+def clauses_to_wcnf(clauses, clause_weight, numvar, top=None):
+    """
+    Serialize weighted clauses in the DIMACS WCNF format, clauses of weight top being hard
+    """
+    dimacs = 'c This is it\np wcnf '+str(numvar)+' '+str(len(clauses))+('' if top is None else ' '+str(top))+'\n' #wcnf
+    for i,clause in enumerate(clauses) :
+        dimacs += str(clause_weight[i]) + ' ' #adding weight
+        for atom in clause :
+            dimacs += str(atom) +' '
+        dimacs += '0\n'
+    return dimacs
+
+
+def write_dimacs_file(dimacs, filename):
+    with open(filename, "w", newline="") as cnf:
+        cnf.write(dimacs)
+
+
+def __getattr__(name):
+    """
+    MRSort_Solver lives in milp.py and is only imported on use, so that the SAT backends
+    and the scoring functions don't need gurobipy
+    """
+    if name == 'MRSort_Solver':
+        from milp import MRSort_Solver
+        return MRSort_Solver
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class SAT_Solver:
@@ -195,15 +126,17 @@ class SAT_Solver:
         Initialize the solver
         """
         self.generator = generator
-        pass
+        # (d, t) already computed, e.g. by init_clauses_lazy
+        self.solution = None
 
     def init_clauses(self, grades, admissions):
         """
         Initialize clauses with the grades and the admissions
         """
+        self.solution = None
         if self.generator.nb_class == 1:  # Simple case
 
-            admissions = admissions.astype(int)
+            admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
 
             # Variable alpha
             alpha = []
@@ -342,29 +275,66 @@ class SAT_Solver:
             self.clause = clause_1 + clause_2 + clause_3 + clause_4 + clause_5
             self.i2v = get_i2v(v2i_alpha, v2i_beta, A)
 
-    def solve(self, path='./'):
+    def init_clauses_lazy(self, grades, admissions, seed_size: int = 100, batch_size: int = 100, max_rounds: int = 50, path='./', timeout: float = None, verbose: int = 1):
+        """
+        Counterexample-guided encoding: solve with a seed subset of the students, classify
+        the whole dataset with the model found and only encode the misclassified students,
+        until the model is consistent with every student or the budget of rounds is spent
+        Args:
+            grades (array<array<int>>) : grades
+            admissions (array<int>) : array of admissions
+            seed_size (int) : number of students encoded in the first round
+            batch_size (int) : maximum number of misclassified students added per round
+            max_rounds (int) : maximum number of calls to the SAT solver
+            path (str) : path to the gophersat solver
+            timeout (float) : time limit in seconds of all the rounds, raises subprocess.TimeoutExpired
+            verbose (bool) : whether to print or not the encoding statistics
+        Returns :
+            rounds (int): number of calls to the SAT solver
+            encoded_fraction (float): fraction of the students encoded in the last round
+        """
+        grades = np.asarray(grades)
+        admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
+        rng = np.random.default_rng(self.generator.seed)
+
+        encoded = np.zeros(len(grades), dtype=bool)
+        encoded[rng.choice(len(grades), size=min(seed_size, len(grades)), replace=False)] = True
+
+        deadline = None if timeout is None else time.time() + timeout
+        total_time = 0
+        for rounds in range(1, max_rounds+1):
+            self.init_clauses(grades[encoded], admissions[encoded])
+            d, t = self.solve(path=path, timeout=None if deadline is None else max(deadline - time.time(), 0))
+            total_time += t
+            if not d:  # UNSAT, the encoded students are already inconsistent
+                break
+            alpha, beta = sat_tables(d, self.generator.nb_grades, self.generator.nb_class)
+            wrong = np.flatnonzero((predict_tables(alpha, beta, grades) != admissions) & ~encoded)
+            if len(wrong) == 0 or rounds == max_rounds:
+                break
+            encoded[rng.permutation(wrong)[:batch_size]] = True
+
+        self.solution = d, total_time
+        self.rounds = rounds
+        self.encoded_fraction = encoded.mean()
+        if verbose == 1:
+            print("Lazy encoding: {} rounds, {:.2f} % of the students encoded".format(
+                rounds, self.encoded_fraction*100))
+        return self.rounds, self.encoded_fraction
+
+    def solve(self, path='./', timeout: float = None):
         """
         Solve SAT clauses
+        Args:
+            path (str) : path to the gophersat solver
+            timeout (float) : time limit in seconds, raises subprocess.TimeoutExpired
         Returns :
             d (float): results
             t (float): time result
         """
-        def clauses_to_dimacs(clauses, numvar):
-            dimacs = 'c This is it\np cnf ' + \
-                str(numvar)+' '+str(len(clauses))+'\n'
-            for clause in clauses:
-                for atom in clause:
-                    dimacs += str(atom) + ' '
-                dimacs += '0\n'
-            return dimacs
-
-        def write_dimacs_file(dimacs, filename):
-            with open(filename, "w", newline="") as cnf:
-                cnf.write(dimacs)
-
         def exec_gophersat(filename, cmd='./gophersat.exe', encoding="utf8"):
             result = subprocess.run(
-                [cmd, filename], stdout=subprocess.PIPE, check=True, encoding=encoding)
+                [cmd, filename], stdout=subprocess.PIPE, check=True, encoding=encoding, timeout=timeout)
             string = str(result.stdout)
             lines = string.splitlines()
 
@@ -418,10 +388,10 @@ class SAT_Solver:
             time (float): time spent trying to find the optimum
             error_rate (int): numer of misclassification 
         """ 
-        d,t = self.solve(path=path) 
+        d,t = self.solve(path=path) if self.solution is None else self.solution
         try:     
             if self.generator.nb_class == 1 :
-                admissions = admissions.astype(int)
+                admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
                 predicted = []
                 for student in grades:
                     validated_courses = set()
@@ -466,15 +436,26 @@ class Max_SAT_Solver:
         Initialize the solver
         """
         self.generator = generator
-        pass
+        # (d, t) already computed
+        self.solution = None
+        # Top weight of the WCNF, None when hard clauses are weighted with W
+        self.top = None
 
-    def init_clauses(self,grades,admissions):
+    def init_clauses(self,grades,admissions, encoding: str = 'coalition'):
         """
         Initialize clauses with the grades and the admissions
+        Args:
+            encoding (str) : 'coalition' makes every clause of every student soft with weight 1,
+                'relaxed' encodes each distinct (grades, admission) once with hard clauses relaxed by
+                one literal, and a single soft clause weighted by the number of such students
         """
+        self.solution = None
+        self.top = None
+        if encoding == 'relaxed':
+            return self.init_clauses_relaxed(grades, admissions)
         if self.generator.nb_class == 1: #Simple case 
 
-            admissions = admissions.astype(int)
+            admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
 
             #Variable alpha
             alpha = []
@@ -494,6 +475,7 @@ class Max_SAT_Solver:
             v2i_beta = {frozenset(v) : A+i+1 for i,v in enumerate(subsets)}
 
             clause_weight = {}
+            clause_student = {} # student of each clause, for the relaxed encoding
             clause_index = 0
             W = int(1e5)
             w = 1
@@ -529,6 +511,7 @@ class Max_SAT_Solver:
                     
                         clause_3.append(alpha+[v2i_beta[frozenset(s.difference(c))]])
                         clause_weight[clause_index] = w
+                        clause_student[clause_index] = st_idx
                         clause_index += 1
 
             #Clause 4
@@ -542,10 +525,12 @@ class Max_SAT_Solver:
                     
                         clause_4.append(alpha+[-v2i_beta[frozenset(c)]])
                         clause_weight[clause_index] = w
+                        clause_student[clause_index] = st_idx
                         clause_index += 1
 
             self.clause = clause_1 + clause_2 + clause_3 + clause_4
             self.clause_weights = clause_weight
+            self.clause_students = clause_student
             self.i2v = {}
             for i in range(len(v2i_alpha)):
                 self.i2v[i+1] = list(v2i_alpha.keys())[list(v2i_alpha.values()).index(i+1)]
@@ -555,6 +540,7 @@ class Max_SAT_Solver:
 
         else: #Multi class case
             clause_weight = {}
+            clause_student = {} # student of each clause, for the relaxed encoding
             clause_index = 0
             W = int(1e5)
             w = 1
@@ -610,6 +596,7 @@ class Max_SAT_Solver:
                 
                     clause_3.append(alpha+[v2i_beta[frozenset(s.difference(c))]])
                     clause_weight[clause_index] = w
+                    clause_student[clause_index] = st_idx
                     clause_index += 1
 
             # Clause 4
@@ -623,6 +610,7 @@ class Max_SAT_Solver:
                     
                         clause_4.append(alpha+[-v2i_beta[frozenset(c)]])
                         clause_weight[clause_index] = w
+                        clause_student[clause_index] = st_idx
                         clause_index += 1
 
             # Clause 5
@@ -637,6 +625,7 @@ class Max_SAT_Solver:
 
             self.clause = clause_1 + clause_2 + clause_3 + clause_4 + clause_5
             self.clause_weights = clause_weight
+            self.clause_students = clause_student
             self.i2v = {}
             for i in range(len(v2i_alpha)):
                 self.i2v[i+1] = list(v2i_alpha.keys())[list(v2i_alpha.values()).index(i+1)]
@@ -644,28 +633,39 @@ class Max_SAT_Solver:
             for i in range(len(v2i_beta)):
                 self.i2v[i+A+1] = list(v2i_beta.keys())[list(v2i_beta.values()).index(i+1+A)]
 
-    def solve(self, path='./'):
+    def init_clauses_relaxed(self, grades, admissions):
+        """
+        Relaxed encoding: the clauses of each distinct student r are made hard as (clause or r),
+        and a soft clause (not r) weighted by the multiplicity of the student counts its misclassification,
+        so that the optimum is exactly the number of misclassified students
+        """
+        rows, counts = np.unique(np.column_stack([np.asarray(grades), np.asarray(admissions).astype(LABEL_DTYPE, copy=False)]),
+                                 axis=0, return_counts=True)
+        self.init_clauses(rows[:, :-1], rows[:, -1])
+
+        numvar = len(self.i2v)
+        self.top = int(counts.sum()) + 1
+        for index, clause in enumerate(self.clause):
+            if index in self.clause_students:
+                clause.append(numvar + self.clause_students[index] + 1)
+            self.clause_weights[index] = self.top
+        for student, count in enumerate(counts):
+            self.i2v[numvar + student + 1] = ('relaxation', student)
+            self.clause_weights[len(self.clause)] = int(count)
+            self.clause.append([-(numvar + student + 1)])
+
+    def solve(self, path='./', timeout: float = None):
         """
         Solve SAT clauses
+        Args:
+            path (str) : path to the gophersat solver
+            timeout (float) : time limit in seconds, raises subprocess.TimeoutExpired
         Returns :
             d (float): results
             t (float): time result
         """
-        def clauses_to_dimacs(clauses,clause_weight,numvar) :
-            dimacs = 'c This is it\np wcnf '+str(numvar)+' '+str(len(clauses))+'\n' #wcnf
-            for i,clause in enumerate(clauses) :
-                dimacs += str(clause_weight[i]) + ' ' #adding weight
-                for atom in clause :
-                    dimacs += str(atom) +' '
-                dimacs += '0\n'
-            return dimacs
-
-        def write_dimacs_file(dimacs, filename):
-            with open(filename, "w", newline="") as cnf:
-                cnf.write(dimacs)
-
         def exec_gophersat(filename, cmd = './gophersat.exe', encoding = "utf8") :
-            result = subprocess.run([cmd, filename], stdout=subprocess.PIPE, check=True, encoding=encoding)
+            result = subprocess.run([cmd, filename], stdout=subprocess.PIPE, check=True, encoding=encoding, timeout=timeout)
             string = str(result.stdout)
             lines = string.splitlines()
 
@@ -692,7 +692,7 @@ class Max_SAT_Solver:
         
         myClauses= self.clause
         myClauseWeights = self.clause_weights
-        myDimacs = clauses_to_dimacs(myClauses,myClauseWeights,len(self.i2v))
+        myDimacs = clauses_to_wcnf(myClauses,myClauseWeights,len(self.i2v),top=self.top)
 
         write_dimacs_file(myDimacs,"./workingfile_maxsat.wcnf")
         t0 = time.time()
@@ -736,10 +736,10 @@ class Max_SAT_Solver:
             time (float): time spent trying to find the optimum
             error_rate (int): numer of misclassification 
         """ 
-        d,t = self.solve(path=path) 
+        d,t = self.solve(path=path) if self.solution is None else self.solution
         try:     
             if self.generator.nb_class == 1 :
-                admissions = admissions.astype(int)
+                admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
                 predicted = []
                 for student in grades:
                     validated_courses = set()
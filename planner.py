@@ -0,0 +1,171 @@
+import os
+import json
+import numpy as np
+
+from models import MAX_GRADE
+from utils.helpers import LABEL_DTYPE
+
+
+TIMINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'timings.jsonl')
+
+# Exponents used when the records of a backend don't vary in size or in criteria:
+# time linear in the students and doubling with each criterion
+PRIOR_SIZE_EXPONENT = 1.0
+PRIOR_CRITERION_FACTOR = float(np.log(2))
+# Above this number of distinct profiles, dominance is checked on a sample
+MAX_PROFILES = 5000
+
+
+def data_profile(grades, admissions, nb_class: int = 1, seed: int = 0):
+    """
+    Describe a dataset for the planner
+    Returns :
+        stats (dict) : size, nb_grades, nb_class, number of distinct grade profiles and number of
+            dominance violations (a student at least as good as another on every course but in a lower class)
+    """
+    grades = np.asarray(grades)
+    admissions = np.asarray(admissions).astype(LABEL_DTYPE, copy=False)
+    rows = np.unique(np.column_stack([grades, admissions]), axis=0)
+    profiles, profile_labels = rows[:, :-1], rows[:, -1]
+
+    if len(profiles) > MAX_PROFILES:
+        sample = np.random.default_rng(seed).choice(len(profiles), size=MAX_PROFILES, replace=False)
+        profiles, profile_labels = profiles[sample], profile_labels[sample]
+    violations = 0
+    for start in range(0, len(profiles), 256):
+        block = slice(start, start + 256)
+        dominates = (profiles[block, None, :] >= profiles[None, :, :]).all(axis=-1)
+        violations += (dominates & (profile_labels[block, None] < profile_labels[None, :])).sum()
+
+    return {'size': len(grades), 'nb_grades': grades.shape[1], 'nb_class': nb_class,
+            'profiles': len(np.unique(grades, axis=0)), 'dominance_violations': int(violations)}
+
+
+def estimate_counts(size, nb_grades, nb_class: int = 1):
+    """
+    Size of each encoding, as built by SAT_Solver/Max_SAT_Solver.init_clauses and MRSort_Solver
+    Returns :
+        counts (dict) : variables, clauses, binaries and constraints
+    """
+    levels = 1 if nb_class == 1 else nb_class + 1
+    coalitions = 2**nb_grades
+    structural = nb_grades * (MAX_GRADE*(MAX_GRADE-1)//2) * nb_class + (3**nb_grades - coalitions)
+    if nb_class > 1:
+        structural += MAX_GRADE * nb_grades * nb_class*(nb_class+1)//2
+    return {'sat_variables': nb_grades*MAX_GRADE*levels + coalitions,
+            'sat_clauses': structural + size*coalitions*(1 if nb_class == 1 else 2),
+            'milp_variables': 2*size*(nb_grades+1) + 2*nb_grades + 2,
+            'milp_binaries': size*nb_grades,
+            'milp_constraints': size*(5*nb_grades + 2) + 1}
+
+
+def load_timings(path: str = TIMINGS):
+    """
+    Recorded timings of successful solves, one JSON record per line: backend, lazy, size, nb_grades,
+    nb_class, profiles and time in seconds, written by benchmarks/bench.py --timings.
+    Failed solves (an error, no model or a model that misclassifies students on these noise-free
+    datasets) are skipped, and so are the portfolio races, whose times include the start of the
+    backends and the time limit margin
+    """
+    with open(path) as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    return [record for record in records if solved(record)]
+
+
+def solved(record):
+    return ('time' in record and not record.get('error') and record.get('found', True)
+            and record.get('accuracy', 1) is not None and record.get('accuracy', 1) >= 1
+            and record.get('source') != 'portfolio')
+
+
+def backend_key(backend, lazy: bool = False):
+    return f"{backend} lazy" if lazy else backend
+
+
+def students(backend, size, profiles=None):
+    """
+    Students that drive the cost of a backend: the MILP has rows for every student, the SAT
+    encodings only depend on the distinct grade profiles (duplicates give the same clauses)
+    """
+    if backend.startswith('MILP') or profiles is None:
+        return size
+    return profiles
+
+
+def calibrate(records):
+    """
+    Fit log(time) = a + b log(students) + c nb_grades for each backend (and lazy encoding),
+    the size and the number of criteria being fitted separately. An exponent that the records
+    don't determine (a single size or a single number of criteria) falls back to its prior
+    Returns :
+        coefficients (dict<str, (float, float, float)>) : (a, b, c) of each backend
+    """
+    coefficients = {}
+    for backend in sorted({backend_key(r['backend'], r.get('lazy', False)) for r in records}):
+        points = [r for r in records if backend_key(r['backend'], r.get('lazy', False)) == backend]
+        x = np.log([students(backend, r['size'], r.get('profiles')) for r in points])
+        g = np.array([r['nb_grades'] for r in points], dtype=float)
+        y = np.log([max(r['time'], 1e-3) for r in points])
+
+        columns, fixed = [np.ones(len(points))], np.zeros(len(points))
+        b, c = PRIOR_SIZE_EXPONENT, PRIOR_CRITERION_FACTOR
+        if np.ptp(x) > 0:
+            columns.append(x)
+        else:
+            fixed += b*x
+        if np.ptp(g) > 0:
+            columns.append(g)
+        else:
+            fixed += c*g
+        solution = np.linalg.lstsq(np.column_stack(columns), y - fixed, rcond=None)[0]
+        a, rest = solution[0], list(solution[1:])
+        if np.ptp(x) > 0:
+            b = rest.pop(0)
+        if np.ptp(g) > 0:
+            c = rest.pop(0)
+        coefficients[backend] = (float(a), float(b), float(c))
+    return coefficients
+
+
+def predict_time(coefficients, backend, size, nb_grades, profiles=None):
+    a, b, c = coefficients[backend]
+    return float(np.exp(a + b*np.log(students(backend, size, profiles)) + c*nb_grades))
+
+
+def plan(grades, admissions, nb_class: int = 1, coefficients=None, verbose: int = 1):
+    """
+    Choose the backend and the encoding with the lowest predicted cost, among the ones with recorded timings
+    Returns :
+        decision (dict) : model (MILP, SAT or Max-SAT), lazy (bool), predicted time and rationale
+    """
+    if coefficients is None:
+        coefficients = calibrate(load_timings())
+    stats = data_profile(grades, admissions, nb_class)
+    counts = estimate_counts(stats['size'], stats['nb_grades'], nb_class)
+
+    rationale = [f"{stats['size']} students, {stats['profiles']} distinct profiles, "
+                 f"{stats['dominance_violations']} dominance violations"]
+    if stats['dominance_violations'] > 0:
+        rationale.append('inconsistent labels (noise): SAT is UNSAT and the MILP infeasible, only Max-SAT fits')
+        options = [('Max-SAT', False)]
+    else:
+        options = [('SAT', False), ('SAT', True), ('Max-SAT', False)]
+        if nb_class == 1:
+            options += [('MILP', False), ('MILP', True)]
+        else:
+            rationale.append('MILP only handles 2 classes')
+    candidates = {(model, lazy): predict_time(coefficients, backend_key(model, lazy), stats['size'],
+                                              stats['nb_grades'], stats['profiles'])
+                  for model, lazy in options if backend_key(model, lazy) in coefficients}
+    if not candidates:
+        raise ValueError('No recorded timings for ' + ', '.join(backend_key(*option) for option in options))
+    rationale.append(f"{counts['sat_clauses']} clauses, {counts['milp_binaries']} MILP binaries")
+    rationale += [f"{model}{' (lazy)' if lazy else ''}: {cost:.3g} s predicted"
+                  for (model, lazy), cost in sorted(candidates.items(), key=lambda item: item[1])]
+
+    (model, lazy), cost = min(candidates.items(), key=lambda item: item[1])
+    if verbose == 1:
+        print(f"Planner: {model}{' (lazy)' if lazy else ''}")
+        for line in rationale:
+            print(f"  - {line}")
+    return {'model': model, 'lazy': lazy, 'predicted_time': cost, 'rationale': rationale, **stats}
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import queue
+import signal
+import multiprocessing
+import numpy as np
+
+import service
+from models import MAX_GRADE, monotone_closure, predict_tables
+
+
+BACKENDS = ('MILP', 'SAT', 'Max-SAT', 'heuristic')
+# Share of the remaining time of the race left to a backend to build its model and report its incumbent
+MARGIN = 0.25
+
+
+def heuristic_fit(grades, admissions):
+    """
+    Fast MR-Sort heuristic (2 classes): each frontier maximizes the balanced accuracy of its criterion
+    alone, then a coalition is a majority if most of the students passing exactly these courses are accepted
+    Returns :
+        params (dict) : alpha and beta tables, as models.sat_tables
+    """
+    grades = np.asarray(grades)
+    accepted = np.asarray(admissions).astype(int) == 1
+    betas = np.zeros(grades.shape[1], dtype=int)
+    for i in range(grades.shape[1]):
+        # Students of each class with a grade >= b, for every frontier b
+        above_accepted = np.cumsum(np.bincount(grades[accepted, i], minlength=MAX_GRADE+1)[::-1])[::-1]
+        above_rejected = np.cumsum(np.bincount(grades[~accepted, i], minlength=MAX_GRADE+1)[::-1])[::-1]
+        score = above_accepted / max(accepted.sum(), 1) - above_rejected / max((~accepted).sum(), 1)
+        betas[i] = score.argmax()
+    alpha = (np.arange(MAX_GRADE) >= betas[:, None])[None]
+
+    masks = ((grades >= betas) << np.arange(grades.shape[1])).sum(axis=1)
+    votes = np.bincount(masks, weights=2*accepted - 1, minlength=2**grades.shape[1])
+    beta = monotone_closure(votes > 0)
+    return {'alpha': alpha.tolist(), 'beta': beta.tolist()}
+
+
+def run_backend(backend, request, cores, path, results, end):
+    """
+    Entry point of the process of one backend: it leads its own process group, so that it is
+    killed together with its gophersat subprocess, and only runs on its share of the cores.
+    Its time limit is what is left of the race once it is started (end being the deadline
+    as a time.time()), less MARGIN, so that an anytime backend reports its incumbent in time
+    """
+    os.setsid()
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    start = time.time()
+    try:
+        if backend == 'heuristic':
+            grades, admissions, _ = service.load_dataset(request)
+            params = heuristic_fit(grades, admissions)
+            predicted = predict_tables(np.array(params['alpha']), np.array(params['beta']), grades)
+            result = {'model': backend, 'params': params, 'accuracy': float((predicted == admissions.astype(int)).mean())}
+        else:
+            service.init_worker(path)
+            time_limit = max(end - time.time(), 0)*(1 - MARGIN)
+            result = service.fit({**request, 'model': backend, 'threads': len(cores) or None, 'time_limit': time_limit})
+        results.put((backend, result, time.time() - start))
+    except Exception as error:
+        results.put((backend, {'error': f'{type(error).__name__}: {error}'}, time.time() - start))
+
+
+def split_cores(backends, cores):
+    """
+    Share the cores between the backends: one for each single-threaded backend, the rest for the MILP
+    Returns :
+        shares (dict<str, list<int>>) : cores of each backend
+    """
+    shares = {}
+    single = [backend for backend in backends if backend != 'MILP']
+    for index, backend in enumerate(single):
+        shares[backend] = [cores[index % len(cores)]]
+    if 'MILP' in backends:
+        shares['MILP'] = cores[len(single):] or cores[-1:]
+    return shares
+
+
+def is_exact(backend, result):
+    """
+    An answer is exact if it classifies the whole dataset correctly, or is a Max-SAT optimum
+    """
+    if 'error' in result or not result.get('params'):
+        return False
+    return result['accuracy'] == 1 or backend == 'Max-SAT'
+
+
+def race(grades, admissions, nb_class: int = 1, backends=BACKENDS, deadline: float = 60, path: str = './',
+         log: str = 'portfolio.jsonl', verbose: int = 1, **options):
+    """
+    Run several backends concurrently on the same data and keep the first exact answer,
+    or the most accurate one when the deadline hits; the losers are killed
+    Args:
+        backends (list<str>) : among MILP, SAT, Max-SAT and heuristic (2 classes only)
+        deadline (float) : time limit in seconds of the race
+        path (str) : path to the gophersat solver
+        log (str) : file where the timing, the outcome and the winner of each backend are appended,
+            in the format of benchmarks/timings.jsonl, None to disable
+        options : other fields of the fit requests (see service.fit), e.g. encoding or objective
+    Returns :
+        race (dict) : winner, its result, whether it is exact, and the time of the race
+    """
+    if nb_class > 1:
+        backends = [backend for backend in backends if backend not in ('MILP', 'heuristic')]
+    grades = np.asarray(grades)
+    request = {'kind': 'fit', 'grades': grades, 'admissions': np.asarray(admissions),
+               'nb_class': nb_class, **options}
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    shares = split_cores(backends, cores) if cores else {backend: [] for backend in backends}
+
+    start = time.time()
+    results = multiprocessing.Queue()
+    processes = {backend: multiprocessing.Process(target=run_backend,
+                                                  args=(backend, request, shares[backend], path, results, start + deadline))
+                 for backend in backends}
+    for process in processes.values():
+        process.start()
+
+    finished = {}
+    winner = None
+    while len(finished) < len(processes):
+        remaining = deadline - (time.time() - start)
+        if remaining <= 0:
+            break
+        try:
+            backend, result, elapsed = results.get(timeout=remaining)
+        except queue.Empty:
+            break
+        finished[backend] = (result, elapsed)
+        if is_exact(backend, result):
+            winner = backend
+            break
+
+    for backend, process in processes.items():
+        if process.is_alive():
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (AttributeError, ProcessLookupError, PermissionError):
+                process.kill()
+        process.join()
+    elapsed = time.time() - start
+
+    exact = winner is not None
+    if winner is None:
+        scored = {backend: result['accuracy'] for backend, (result, _) in finished.items() if result.get('params')}
+        if scored:
+            winner = max(scored, key=scored.get)
+
+    if log is not None:
+        profiles = len(np.unique(grades, axis=0))
+        with open(log, 'a') as file:
+            for backend in backends:
+                record = {'backend': backend, 'lazy': False, 'size': len(grades), 'nb_grades': grades.shape[1],
+                          'nb_class': nb_class, 'profiles': profiles, 'finished': backend in finished,
+                          'won': backend == winner, 'exact': exact and backend == winner,
+                          'encoding': options.get('encoding', 'coalition') if backend == 'Max-SAT' else None,
+                          'source': 'portfolio'}
+                if backend in finished:
+                    result, record['time'] = finished[backend]
+                    record.update(error=result.get('error'), found=bool(result.get('params')),
+                                  accuracy=result.get('accuracy'))
+                file.write(json.dumps(record) + '\n')
+
+    if verbose == 1:
+        for backend in backends:
+            status = 'killed' if backend not in finished else \
+                finished[backend][0].get('error', 'accuracy {:.2f} %'.format(finished[backend][0].get('accuracy', 0)*100))
+            print(f"Portfolio {backend} ({len(shares[backend])} cores): {status}")
+        print(f"Winner: {winner} ({'exact' if exact else 'best at deadline'}) in {elapsed:.2f} seconds")
+    return {'winner': winner, 'result': finished[winner][0] if winner else None, 'exact': exact, 'time': elapsed}
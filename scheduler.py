@@ -0,0 +1,157 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+import service
+from planner import estimate_counts, calibrate, load_timings, predict_time, backend_key
+
+
+# Memory of the encodings, measured with tracemalloc (Python side) and the resident size (Gurobi side)
+BYTES_PER_CLAUSE = 500  # clauses, DIMACS file and gophersat
+BYTES_PER_MILP_ROW = 5000
+BYTES_PER_CELL = 64  # grades of the other backends, a few copies
+
+
+def init_slot(path, slots, next_slot):
+    """
+    Initialize a worker of the scheduler: pin it to its own slot of cores (the gophersat
+    subprocesses inherit the affinity), then warm it up as a worker of the service
+    """
+    with next_slot.get_lock():
+        slot = slots[next_slot.value % len(slots)]
+        next_slot.value += 1
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, slot)
+    service.init_worker(path)
+
+
+def run_scheduled(request):
+    """
+    Run a job of the service in a worker of the scheduler
+    Returns :
+        result (dict) : result of the job, or its error
+        elapsed (float) : time spent in seconds
+    """
+    start = time.time()
+    try:
+        result = service.run_job(request)
+    except Exception as error:  # Timeout or solver failure, reported with the job
+        result = {'error': f'{type(error).__name__}: {error}'}
+    return result, time.time() - start
+
+
+def dataset_shape(request):
+    grades, _, nb_class = service.load_dataset(request)
+    return len(grades), grades.shape[1], nb_class
+
+
+def estimate_memory(request):
+    """
+    Memory of a fit job, from the size of its encoding (see planner.estimate_counts)
+    Returns :
+        memory (int) : estimated bytes
+    """
+    size, nb_grades, nb_class = dataset_shape(request)
+    counts = estimate_counts(size, nb_grades, nb_class)
+    model = request.get('model', 'MILP')
+    if model in ('SAT', 'Max-SAT'):
+        return counts['sat_clauses'] * BYTES_PER_CLAUSE
+    if model == 'MILP':
+        return counts['milp_constraints'] * BYTES_PER_MILP_ROW
+    return size * nb_grades * BYTES_PER_CELL
+
+
+class Scheduler:
+    def __init__(self, cores=None, threads: int = 1, memory: int = None, path: str = './', verbose: int = 1):
+        """
+        Run fit jobs concurrently without oversubscribing the machine: every worker owns a slot of
+        threads cores, used as the Threads of Gurobi or as the CPU affinity of gophersat
+        Args:
+            cores (int or list<int>) : number or list of the cores to use, all the available ones by default
+            threads (int) : cores of each slot
+            memory (int) : bytes that the running jobs may use together (estimate_memory), unlimited by default
+            path (str) : path to the gophersat solver
+        """
+        available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+        if cores is None or isinstance(cores, int):
+            cores = available[:cores]
+        self.cores = list(cores)
+        self.threads = max(1, min(threads, len(self.cores)))
+        self.slots = [self.cores[i:i + self.threads]
+                      for i in range(0, len(self.cores) - self.threads + 1, self.threads)]
+        self.memory = memory
+        self.path = path
+        self.verbose = verbose
+        self.report = None
+
+    def order(self, requests):
+        """
+        Longest jobs first (predicted by the planner from the recorded timings), so that the
+        last running jobs are short and the cores stay busy until the end
+        Returns :
+            order (list<int>) : indices of the requests
+        """
+        try:
+            coefficients = calibrate(load_timings())
+        except (OSError, ValueError):
+            coefficients = {}
+
+        def cost(index):
+            request = requests[index]
+            backend = backend_key(request.get('model', 'MILP'), request.get('lazy', False))
+            if request.get('kind', 'fit') != 'fit' or backend not in coefficients:
+                return 0
+            grades, _, _ = service.load_dataset(request)
+            # the SAT encodings grow with the distinct grade profiles, as in planner.plan
+            profiles = len(np.unique(grades, axis=0))
+            return predict_time(coefficients, backend, len(grades), grades.shape[1], profiles)
+        return sorted(range(len(requests)), key=cost, reverse=True)
+
+    def map(self, requests):
+        """
+        Run the jobs, admitting a new one when a slot is free and its estimated memory fits the budget
+        (a job above the budget alone runs on its own)
+        Returns :
+            results (list<dict>) : result of each job, in the order of the requests
+        """
+        requests = [dict(request, threads=self.threads) if request.get('model', 'MILP') == 'MILP' else request
+                    for request in requests]
+        memory = [estimate_memory(request) if request.get('kind', 'fit') == 'fit' else 0 for request in requests]
+        pending = self.order(requests)
+        results = [None] * len(requests)
+        running = {}
+        used, peak, busy, concurrency = 0, 0, 0., 0
+
+        start = time.time()
+        next_slot = multiprocessing.Value('i', 0)
+        with ProcessPoolExecutor(max_workers=len(self.slots), initializer=init_slot,
+                                 initargs=(self.path, self.slots, next_slot)) as executor:
+            while pending or running:
+                while pending and len(running) < len(self.slots):
+                    index = pending[0]
+                    if self.memory is not None and running and used + memory[index] > self.memory:
+                        break
+                    pending.pop(0)
+                    running[executor.submit(run_scheduled, requests[index])] = index
+                    used += memory[index]
+                    peak, concurrency = max(peak, used), max(concurrency, len(running))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    results[index], elapsed = future.result()
+                    used -= memory[index]
+                    busy += elapsed * self.threads
+        wall = time.time() - start
+
+        self.report = {'jobs': len(requests), 'slots': len(self.slots), 'threads': self.threads, 'wall': wall,
+                       'utilisation': busy / (wall * len(self.slots) * self.threads) if wall > 0 else 0.,
+                       'max_concurrency': concurrency, 'peak_memory': peak,
+                       'failed': sum('error' in result for result in results)}
+        if self.verbose == 1:
+            print(f"Scheduler: {len(requests)} jobs on {len(self.slots)} slots of {self.threads} cores in {wall:.2f} seconds, "
+                  f"utilisation {self.report['utilisation']*100:.1f} %, at most {concurrency} concurrent jobs, "
+                  f"peak estimated memory {peak/2**20:.1f} MiB, {self.report['failed']} failed")
+        return results
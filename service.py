@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import queue
+import tempfile
+import threading
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import sys
+sys.path.append('./')
+
+from utils.argument import parse_service_arguments
+from utils.helpers import read_data_csv, GRADE_DTYPE, LABEL_DTYPE
+from factory import instance_key
+
+
+# State of each worker process, kept warm between jobs
+worker = {}
+
+
+def init_worker(gophersat_path):
+    """
+    Initialize a worker of the pool: import the solvers, create the Gurobi environment once
+    and work in a private directory so that the SAT working files of the workers don't collide
+    (relative dataset files are still read from the directory the worker was started in)
+    """
+    import models
+    from generator import GradesGenerator
+    worker['models'] = models
+    worker['GradesGenerator'] = GradesGenerator
+    worker['path'] = os.path.abspath(gophersat_path) + os.sep
+    try:
+        import gurobipy
+        env = gurobipy.Env(empty=True)
+        env.setParam('OutputFlag', 0)
+        env.start()
+        worker['env'] = env
+    except Exception:  # No Gurobi install or license, only the SAT backends are available
+        worker['env'] = None
+    worker['cwd'] = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix='mrsort_worker_'))
+
+
+def load_dataset(request):
+    """
+    Read the dataset of a request, either inline or from a file (.csv as in data/ or .npz), the
+    instance of a factory.py shard being selected by its id
+    Returns :
+        grades (array<array<uint8>>) : grades
+        admissions (array<int8>) : array of admissions
+        nb_class (int) : number of classes
+    """
+    if 'file' in request:
+        file = os.path.join(worker.get('cwd', ''), request['file'])
+        if file.endswith('.npz'):
+            with np.load(file) as data:
+                if 'instance' in request:
+                    grades = data[instance_key(request['instance'], 'grades')]
+                    admissions = data[instance_key(request['instance'], 'admissions')]
+                else:
+                    grades, admissions = data['grades'], data['admissions']
+        else:
+            grades, admissions, _, _, nb_class = read_data_csv(path='', data=file)
+            return grades, admissions, request.get('nb_class', nb_class)
+    else:
+        grades = np.asarray(request['grades'], dtype=GRADE_DTYPE)
+        admissions = np.asarray(request.get('admissions', []), dtype=LABEL_DTYPE)
+    return grades, admissions, request.get('nb_class', 1)
+
+
+def fit(request):
+    """
+    Fit a model on the dataset of the request
+    Returns :
+        result (dict) : learned parameters and scores of the model
+    """
+    models = worker['models']
+    grades, admissions, nb_class = load_dataset(request)
+    gen = worker['GradesGenerator'](size=len(grades), nb_grades=grades.shape[1], nb_class=nb_class,
+                                    noise=0, seed=request.get('seed', 0))
+    model = request.get('model', 'MILP')
+    if model == 'MILP':
+        if worker['env'] is None:
+            raise RuntimeError('Gurobi is not available in the workers')
+        objective = request.get('objective', 'MaxMin')
+        if request.get('template', False) and not request.get('lazy', False):
+            # Same-shaped datasets reuse the model of the worker, only its data is updated
+            from milp import MRSort_Template
+            key = (len(grades), grades.shape[1], objective)
+            solver = worker.setdefault('templates', {}).get(key)
+            if solver is None:
+                solver = worker['templates'][key] = MRSort_Template(gen, objective=objective, grades=grades,
+                                                                    admission=admissions, env=worker['env'])
+            else:
+                solver.set_data(grades, admissions)
+        else:
+            solver = models.MRSort_Solver(gen, grades=grades, admission=admissions,
+                                          lazy=request.get('lazy', False), env=worker['env'])
+            solver.set_constraint(objective)
+        solver.solve(time_limit=request.get('time_limit'), threads=request.get('threads'), verbose=0)
+        f1_score_, accuracy_, time_, errors = solver.get_results(verbose=0)
+        params = solver.parameters() if errors == 0 else {}
+    elif model == 'enumerative':
+        from enumerative import Enumerative_Solver
+        solver = Enumerative_Solver(gen, grades=grades, admission=admissions, workers=1)
+        solver.solve()
+        f1_score_, accuracy_, time_, errors = solver.get_results(verbose=0)
+        params = {'weights': solver.weights.tolist(), 'betas': solver.betas.tolist(), 'lambda': float(solver.lbd)}
+    elif model in ('SAT', 'Max-SAT'):
+        solver = models.SAT_Solver(gen) if model == 'SAT' else models.Max_SAT_Solver(gen)
+        if request.get('lazy', False) and model == 'SAT':
+            solver.init_clauses_lazy(grades, admissions, path=worker['path'], timeout=request.get('time_limit'),
+                                     verbose=0)
+        else:
+            if model == 'Max-SAT':
+                solver.init_clauses(grades, admissions, encoding=request.get('encoding', 'coalition'))
+            else:
+                solver.init_clauses(grades, admissions)
+            solver.solution = solver.solve(path=worker['path'], timeout=request.get('time_limit'))
+        f1_score_, accuracy_, time_, errors = solver.get_results(grades, admissions, path=worker['path'], verbose=0)
+        d = solver.solution[0]
+        params = {}
+        if d:
+            alpha, beta = models.sat_tables(d, gen.nb_grades, nb_class)
+            params = {'alpha': alpha.tolist(), 'beta': beta.tolist()}
+    else:
+        raise ValueError(f'Unknown model {model}')
+    return {'model': model, 'params': params, 'f1_score': float(f1_score_),
+            'accuracy': float(accuracy_), 'time': time_, 'errors': int(errors)}
+
+
+def predict(request):
+    """
+    Classify the students of the request with the parameters returned by a fit job
+    Returns :
+        result (dict) : class of each student
+    """
+    grades, _, _ = load_dataset(request)
+    params = request['params']
+    if 'weights' in params:
+        predicted = ((grades > np.array(params['betas'])) * np.array(params['weights'])).sum(axis=1) > params['lambda']
+    else:
+        predicted = worker['models'].predict_tables(np.array(params['alpha']), np.array(params['beta']), grades)
+    return {'predicted': predicted.astype(int).tolist()}
+
+
+def run_job(request):
+    """
+    Entry point of the workers
+    """
+    if request.get('kind', 'fit') == 'fit':
+        return fit(request)
+    return predict(request)
+
+
+def check_request(request):
+    """
+    Reject a request that can't be run before it gets a job id
+    Raises :
+        ValueError : the request is not an object or has no dataset
+    """
+    if not isinstance(request, dict):
+        raise ValueError('the request should be a JSON object')
+    required = ['grades'] if request.get('kind', 'fit') == 'predict' else ['grades', 'admissions']
+    if 'file' not in request and any(key not in request for key in required):
+        raise ValueError(f"the request should have a file or {' and '.join(required)}")
+    if request.get('kind', 'fit') == 'predict' and 'params' not in request:
+        raise ValueError('a predict request should have the params of a fit job')
+
+
+class FitService:
+    def __init__(self, workers: int = None, gophersat_path: str = './'):
+        """
+        Queue of jobs run on a warm pool of worker processes
+        """
+        self.workers = workers or os.cpu_count()
+        self.pool = multiprocessing.Pool(self.workers, initializer=init_worker, initargs=(gophersat_path,))
+        self.queue = queue.Queue()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.next_id = 0
+        # One dispatcher per worker, so that a job is only handed to the pool when a worker is free
+        for _ in range(self.workers):
+            threading.Thread(target=self.dispatch, daemon=True).start()
+
+    def submit(self, request):
+        """
+        Queue a job
+        Returns :
+            job_id (int): id of the job
+        """
+        check_request(request)
+        with self.lock:
+            job_id = self.next_id
+            self.next_id += 1
+            self.jobs[job_id] = {'id': job_id, 'kind': request.get('kind', 'fit'), 'status': 'queued',
+                                 'submitted': time.time(), 'started': None, 'finished': None}
+        self.queue.put((job_id, request))
+        return job_id
+
+    def dispatch(self):
+        while True:
+            job_id, request = self.queue.get()
+            with self.lock:
+                self.jobs[job_id].update(status='running', started=time.time())
+            try:
+                update = {'status': 'done', 'result': self.pool.apply(run_job, (request,))}
+            except Exception as error:
+                update = {'status': 'failed', 'error': f'{type(error).__name__}: {error}'}
+            with self.condition:
+                self.jobs[job_id].update(finished=time.time(), **update)
+                self.condition.notify_all()
+
+    def status(self, job_id, wait: float = 0):
+        """
+        Status of a job, waiting at most wait seconds for it to finish
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.jobs[job_id]['finished'] is not None, timeout=wait)
+            return dict(self.jobs[job_id])
+
+    def metrics(self):
+        """
+        Queue depth, counts and latencies (in seconds) of the jobs
+        """
+        with self.lock:
+            jobs = list(self.jobs.values())
+        finished = [job for job in jobs if job['finished'] is not None]
+        waits = np.array([job['started'] - job['submitted'] for job in finished])
+        latencies = np.array([job['finished'] - job['submitted'] for job in finished])
+
+        def stats(values):
+            if len(values) == 0:
+                return {}
+            return {'mean': values.mean(), 'p50': np.percentile(values, 50),
+                    'p95': np.percentile(values, 95), 'max': values.max()}
+
+        return {'workers': self.workers,
+                'queue_depth': self.queue.qsize(),
+                'running': sum(job['status'] == 'running' for job in jobs),
+                'done': sum(job['status'] == 'done' for job in jobs),
+                'failed': sum(job['status'] == 'failed' for job in jobs),
+                'queue_wait': stats(waits),
+                'latency': stats(latencies)}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != '/jobs':
+                return self.reply(404, {'error': 'not found'})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError:
+                return self.reply(400, {'error': 'invalid json'})
+            try:
+                job_id = service.submit(request)
+            except ValueError as error:
+                return self.reply(400, {'error': str(error)})
+            self.reply(202, {'id': job_id, 'status': 'queued'})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/metrics':
+                return self.reply(200, service.metrics())
+            parts = url.path.strip('/').split('/')
+            if len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit() and int(parts[1]) in service.jobs:
+                wait = float(parse_qs(url.query).get('wait', [0])[0])
+                return self.reply(200, service.status(int(parts[1]), wait=wait))
+            self.reply(404, {'error': 'not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == '__main__':
+    args = parse_service_arguments()
+    service = FitService(workers=args.workers, gophersat_path=args.gophersat)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving on http://{args.host}:{args.port} with {service.workers} workers")
+    server.serve_forever()
@@ -29,12 +29,104 @@ def parse_arguments():
     parser.add_argument("-m",
                         "--model",
                         default='MILP',
-                        choices=['MILP', 'SAT','Max-SAT'],
+                        choices=['MILP', 'SAT','Max-SAT', 'enumerative', 'alternating', 'auto', 'portfolio'],
                         help='Choosing the model used for prediction (default: %(default)s)')
     parser.add_argument("-c",
                         "--csv",
                         default='',
                         help='Choosing the dataset used (default: %(default)s)')
+    parser.add_argument("--lazy",
+                        action='store_true',
+                        help='Only encode the students needed to constrain the solution (MILP and SAT only)')
+    parser.add_argument("--encoding",
+                        default='coalition',
+                        choices=['coalition', 'relaxed'],
+                        help='Encoding of the students for Max-SAT (default: %(default)s)')
+    parser.add_argument("-e",
+                        "--ensemble",
+                        default=0,
+                        type=int,
+                        help='Number of models of the bagged ensemble, 0 to learn a single model (default: %(default)s)')
+    parser.add_argument("--sample_size",
+                        default=100,
+                        type=int,
+                        help='Number of students of each subsample of the ensemble (default: %(default)s)')
+    parser.add_argument("--deadline",
+                        default=60,
+                        type=float,
+                        help='Time limit in seconds of the portfolio race (default: %(default)s)')
+    return parser.parse_args()
+
+
+def parse_factory_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o",
+                        "--out",
+                        default='data/instances',
+                        help='Output directory (default: %(default)s)')
+    parser.add_argument("-s",
+                        "--sizes",
+                        default=[150],
+                        nargs='+',
+                        type=int,
+                        help="""Numbers of students""")
+    parser.add_argument("-g",
+                        "--nb_grades",
+                        default=[3],
+                        nargs='+',
+                        type=int,
+                        help="""nb_grades""")
+    parser.add_argument("-n",
+                        "--nb_class",
+                        default=[1],
+                        nargs='+',
+                        type=int,
+                        help="""nb_class""")
+    parser.add_argument("-b",
+                        "--noise",
+                        default=[0],
+                        nargs='+',
+                        type=float,
+                        help="""noise""")
+    parser.add_argument("-r",
+                        "--repeats",
+                        default=10,
+                        type=int,
+                        help="""Number of instances per combination of parameters""")
+    parser.add_argument("--seed",
+                        default=0,
+                        type=int,
+                        help="""Root seed of the instances""")
+    parser.add_argument("--shard_size",
+                        default=100,
+                        type=int,
+                        help="""Number of instances per shard""")
+    parser.add_argument("-w",
+                        "--workers",
+                        default=None,
+                        type=int,
+                        help="""Number of processes (default: all the cores)""")
+    return parser.parse_args()
+
+
+def parse_service_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host",
+                        default='127.0.0.1',
+                        help='Address to listen on (default: %(default)s)')
+    parser.add_argument("-p",
+                        "--port",
+                        default=8765,
+                        type=int,
+                        help='Port to listen on (default: %(default)s)')
+    parser.add_argument("-w",
+                        "--workers",
+                        default=None,
+                        type=int,
+                        help="""Number of worker processes (default: all the cores)""")
+    parser.add_argument("--gophersat",
+                        default='./',
+                        help='Directory of the gophersat solver (default: %(default)s)')
     return parser.parse_args()
 
 
@@ -1,6 +1,11 @@
 from itertools import chain
 from itertools import combinations
 import csv 
+import numpy as np
+
+# Compact representation of the datasets: grades are in 0..20 and classes in 0..nb_class
+GRADE_DTYPE = np.uint8
+LABEL_DTYPE = np.int8
 
 def powerset(iterable): 
             s = list(iterable)
@@ -25,6 +30,6 @@ def read_data_csv(path: str="data", data: str='/data6crit50ex.csv'):
         nb_grades = int(data[2][0])
         nb_class = int(data[2][1])-1
 
-        grades = [[int(data[i][j+1]) for j in range(nb_grades)] for i in range(3, 3+size)]
-        admission = [(int(data[i][nb_grades+1]) - 1) for i in range(3, 3+size)]    
+        grades = np.array([[int(data[i][j+1]) for j in range(nb_grades)] for i in range(3, 3+size)], dtype=GRADE_DTYPE)
+        admission = np.array([(int(data[i][nb_grades+1]) - 1) for i in range(3, 3+size)], dtype=LABEL_DTYPE)
     return grades,admission, size, nb_grades, nb_class
\ No newline at end of file